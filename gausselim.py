@@ -1,5 +1,4 @@
 import random
-from copy import deepcopy
 from typing import Tuple
 from permutation import (
     Perm,
@@ -7,16 +6,21 @@ from permutation import (
     permute,
 )
 from matrix import (
-    Mat,
+    AnyMat,
+    Matrix,
+    copyMat,
+    identityMat,
+    matRows,
     multMat,
     matToString,
     isMatIdentity,
     isMatEqual,
     permuteMatCols,
     permuteMatRows,
+    swapMatRows,
 )
 
-def _findPivot(mat: Mat, k: int, n: int) -> int:
+def _findPivot(mat: AnyMat, k: int, n: int) -> int:
     value = abs(mat[k][k])
     valueId = k
     for rowId in range(k, n):
@@ -26,42 +30,49 @@ def _findPivot(mat: Mat, k: int, n: int) -> int:
             valueId = rowId
     return valueId
 
-def _elim(l: Mat, u: Mat, k: int, n: int) -> None:
+def _elim(l: AnyMat, u: AnyMat, k: int, n: int) -> None:
+    pivotRow = u[k]
+    pivot = pivotRow[k]
+    rest = pivotRow[k+1:n]
     for rowId in range(k+1, n):
-        c = u[rowId][k] / u[k][k]
+        row = u[rowId]
+        c = row[k] / pivot
         l[rowId][k] = c
-        u[rowId][k] = 0
-        for colId in range(k+1, n):
-            u[rowId][colId] -= c*u[k][colId]
+        row[k] = 0
+        # One slice read and write per row, for lists and Matrix rows alike.
+        row[k+1:n] = [x - c*y for x, y in zip(row[k+1:n], rest)]
 
-def _permute(p: Perm, l: Mat, k: int, n: int) -> None:
+def _permute(p: Perm, l: AnyMat, k: int, n: int) -> None:
     def read(key):
         return l[key][k]
     def write(key, value):
         l[key][k] = value
     permute(p, i=k+1, j=n, read=read, write=write)
 
-def _plu(p: Perm, l: Mat, u: Mat, k: int, n: int) -> None:
+def _plu(p: Perm, l: AnyMat, u: AnyMat, k: int, n: int) -> None:
     if k == n:
         return
     pivotRowId = _findPivot(u, k, n)
-    u[k], u[pivotRowId] = u[pivotRowId], u[k]
+    swapMatRows(u, k, pivotRowId)
     _elim(l, u, k, n)
     _plu(p, l, u, k+1, n)
     _permute(p, l, k, n)
     p[k], p[pivotRowId] = p[pivotRowId], p[k]
 
-def plu(mat: Mat) -> Tuple[Perm, Mat, Mat]:
+def plu(mat: AnyMat) -> Tuple[Perm, AnyMat, AnyMat]:
+    """P, L, U with L and U of the same kind as mat (Mat or Matrix)."""
     n = len(mat)
     p = list(range(n))
-    l = [[1.0 if i == j else 0.0 for j in range(n)] for i in range(n)]
-    u = deepcopy(mat)
+    l = identityMat(n, like=mat)
+    u = copyMat(mat)
     _plu(p, l, u, 0, n)
     invertPerm(p)
     return p, l, u
 
-def invertUpper(u: Mat) -> Mat:
+def invertUpper(u: AnyMat) -> AnyMat:
     n = len(u)
+    flat = isinstance(u, Matrix)
+    u = matRows(u)
     mat = [[0.0]*n for _ in range(n)]
     for k in range(n):
         mat[k][k] = 1 / u[k][k]
@@ -69,10 +80,12 @@ def invertUpper(u: Mat) -> Mat:
         while i >= 0:
             mat[i][k] = -sum(u[i][j]*mat[j][k] for j in range(k, i, -1)) / u[i][i]
             i -= 1
-    return mat
+    return Matrix.fromRows(mat) if flat else mat
 
-def invertLower(l: Mat) -> Mat:
+def invertLower(l: AnyMat) -> AnyMat:
     n = len(l)
+    flat = isinstance(l, Matrix)
+    l = matRows(l)
     mat = [[0.0]*n for _ in range(n)]
     for k in range(n):
         mat[k][k] = 1 / l[k][k]
@@ -80,9 +93,9 @@ def invertLower(l: Mat) -> Mat:
         while i < n:
             mat[i][k] = -sum(l[i][j]*mat[j][k] for j in range(0, i)) / l[i][i]
             i += 1
-    return mat
+    return Matrix.fromRows(mat) if flat else mat
 
-def invertMat(mat: Mat) -> Mat:
+def invertMat(mat: AnyMat) -> AnyMat:
     p, l, u = plu(mat)
     lInv = invertLower(l)
     uInv = invertUpper(u)
@@ -90,7 +103,39 @@ def invertMat(mat: Mat) -> Mat:
     permuteMatCols(p, matInv)
     return matInv
 
-def _debug(mat: Mat, matInv: Mat, iden: Mat) -> None:
+def solveMat(a: AnyMat, b: AnyMat) -> AnyMat:
+    """X with a X = b, without forming the inverse of a.
+
+    One PLU of a, then forward and back substitution on whole rows of b:
+    O(n^2 m) after the factorization, where multMat(invertMat(a), b) pays
+    for two triangular inverses and a full product.
+    """
+    p, l, u = plu(a)
+    flat = isinstance(a, Matrix) or isinstance(b, Matrix)
+    l, u, b = matRows(l), matRows(u), matRows(b)
+    n = len(l)
+    # Row p[i] of a is row i of LU, so solve LU X = b[p].
+    x = [list(b[p[i]]) for i in range(n)]
+    # L has a unit diagonal.
+    for i in range(n):
+        li = l[i]
+        xi = x[i]
+        for k in range(i):
+            c = li[k]
+            if c:
+                xi[:] = [s - c*t for s, t in zip(xi, x[k])]
+    for i in range(n-1, -1, -1):
+        ui = u[i]
+        xi = x[i]
+        for k in range(i+1, n):
+            c = ui[k]
+            if c:
+                xi[:] = [s - c*t for s, t in zip(xi, x[k])]
+        d = ui[i]
+        xi[:] = [s / d for s in xi]
+    return Matrix.fromRows(x) if flat else x
+
+def _debug(mat: AnyMat, matInv: AnyMat, iden: AnyMat) -> None:
     print('Size:', len(mat))
     p, l, u = plu(mat)
     lu = multMat(l, u)
@@ -137,6 +182,20 @@ def _runTest() -> None:
         if not isMatIdentity(iden):
             _debug(mat, matInv, iden)
             return
+        flat = Matrix.fromRows(mat)
+        flatInv = invertMat(flat)
+        if not isinstance(flatInv, Matrix) or not isMatEqual(flatInv, matInv):
+            print('Matrix inverse differs:')
+            _debug(flat, flatInv, multMat(flat, flatInv))
+            return
+        b = [[random.random() for j in range(3)] for i in range(n)]
+        if not isMatEqual(multMat(mat, solveMat(mat, b)), b):
+            print('Solve failed.')
+            return
+        # Strided views go through the same routines.
+        if not isMatIdentity(multMat(invertMat(flat.T), flat.T)):
+            print('Transposed view inverse failed.')
+            return
     print('Nice!')
 
 if __name__ == '__main__':
@@ -0,0 +1,93 @@
+"""Interval tree on top of the Red-Black Tree.
+
+Keys are (start, end) pairs, so intervals sort by start and the plain tree
+operations apply unchanged. Each node also tracks the largest end in its
+subtree, which lets overlap queries skip whole subtrees.
+"""
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+from rbtree import (
+  OSNode,
+  OSTree,
+  _checkTree,
+)
+
+@dataclass(slots=True, eq=False)
+class IntervalNode[KT, VT](OSNode[Tuple[KT, KT], VT]):
+  maxEnd: Optional[KT] = None
+
+@dataclass(eq=False)
+class IntervalTree[KT, VT](OSTree[Tuple[KT, KT], VT]):
+  """Closed intervals [start, end] keyed by (start, end)."""
+
+  def _newNode(self, k: Tuple[KT, KT], v: VT) -> IntervalNode[KT, VT]:
+    if k[1] < k[0]:
+      raise ValueError(f'Interval end before start: {k}.')
+    return IntervalNode(k, v, maxEnd=k[1])
+
+  def _update(self, node: IntervalNode) -> None:
+    super()._update(node)
+    maxEnd = node.key[1]
+    for child in (node.left, node.right):
+      if child is not None and maxEnd < child.maxEnd:
+        maxEnd = child.maxEnd
+    node.maxEnd = maxEnd
+
+  def overlapping(self, lo: KT, hi: KT) -> Iterator[IntervalNode[KT, VT]]:
+    """Lazily yield nodes whose interval meets [lo, hi], in key order.
+
+    Subtrees whose max end is below lo, and right subtrees of nodes that
+    start after hi, are never entered. Each reported interval costs at most
+    one O(log n) descent, so a query is O(min(n, (k+1) log n)) for k
+    results, as in CLRS, not O(log n + k). The stack stays O(log n).
+    """
+    node = self.root
+    stack = []
+    while node or stack:
+      while node is not None and not node.maxEnd < lo:
+        stack.append(node)
+        node = node.left
+      if not stack:
+        return
+      node = stack.pop()
+      start, end = node.key
+      if hi < start:
+        return
+      if not end < lo:
+        yield node
+      node = node.right
+
+  def stabbing(self, point: KT) -> Iterator[IntervalNode[KT, VT]]:
+    return self.overlapping(point, point)
+
+def _runTest() -> None:
+  import random
+  t = IntervalTree()
+  intervals = []
+  for i in range(2000):
+    start = random.randrange(1000)
+    key = (start, start + random.randrange(50))
+    intervals.append(key)
+    t.insert(key, i)
+  _checkTree(t)
+  for _ in range(200):
+    lo = random.randrange(-10, 1060)
+    hi = lo + random.randrange(30)
+    expected = sorted(k for k in intervals if k[0] <= hi and lo <= k[1])
+    assert [node.key for node in t.overlapping(lo, hi)] == expected
+  random.shuffle(intervals)
+  for key in intervals[:1500]:
+    del t[key]
+  _checkTree(t)
+  rest = intervals[1500:]
+  for point in range(0, 1050, 7):
+    expected = sorted(k for k in rest if k[0] <= point <= k[1])
+    assert [node.key for node in t.stabbing(point)] == expected
+  lower, upper = t.split((500, 0))
+  for part in (lower, upper):
+    _checkTree(part)
+    assert [n.key for n in part.overlapping(0, 2000)] == [n.key for n in part._iterNodes()]
+  print('Nice!')
+
+if __name__ == '__main__':
+  _runTest()
@@ -0,0 +1,281 @@
+"""Lazy matrix expressions.
+
+lazy(mat) wraps a Mat, Matrix or PermMatrix; @ and inverse() only
+record the expression. evaluate() then:
+- multiplies each run of plain factors in the cheapest order, found by
+  the matrix-chain dynamic program,
+- composes adjacent permutations and applies them as row or column
+  gathers, never as products,
+- turns inverse(A) @ B into solveMat(A, B), and B @ inverse(A) into a
+  solve against the transpose,
+- allocates only the intermediates of that plan.
+Nothing is cached: evaluate() reads the wrapped matrices as they are
+when called.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, List, Tuple
+from gausselim import (
+    invertMat,
+    solveMat,
+)
+from matrix import (
+    AnyMat,
+    Matrix,
+    PermMatrix,
+    matRows,
+    multMat,
+)
+
+def _shape(mat: Any) -> Tuple[int, int]:
+    if isinstance(mat, (Matrix, PermMatrix)):
+        return mat.shape
+    return (len(mat), len(mat[0]) if mat else 0)
+
+def _transpose(mat: AnyMat) -> AnyMat:
+    if isinstance(mat, Matrix):
+        return mat.T.copy()
+    return [list(col) for col in zip(*mat)]
+
+class Expr(ABC):
+    __slots__ = ()
+
+    @property
+    @abstractmethod
+    def shape(self) -> Tuple[int, int]:
+        ...
+
+    def __matmul__(self, other: Any) -> 'Product':
+        return Product([self, lazy(other)])
+
+    def __rmatmul__(self, other: Any) -> 'Product':
+        return Product([lazy(other), self])
+
+    def inverse(self) -> 'Inverse':
+        return Inverse(self)
+
+    @abstractmethod
+    def evaluate(self) -> Any:
+        ...
+
+class Leaf(Expr):
+    __slots__ = ('mat',)
+
+    def __init__(self, mat: Any) -> None:
+        self.mat = mat
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return _shape(self.mat)
+
+    def inverse(self) -> Expr:
+        if isinstance(self.mat, PermMatrix):
+            return Leaf(self.mat.inverse())
+        return Inverse(self)
+
+    def evaluate(self) -> Any:
+        """The wrapped matrix itself, not a copy."""
+        return self.mat
+
+    def __repr__(self) -> str:
+        return f'Leaf({_shape(self.mat)})'
+
+class Inverse(Expr):
+    __slots__ = ('arg',)
+
+    def __init__(self, arg: Expr) -> None:
+        rows, cols = arg.shape
+        if rows != cols:
+            raise ValueError(f'Inverse of a non-square {rows} x {cols} matrix.')
+        self.arg = arg
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.arg.shape
+
+    def inverse(self) -> Expr:
+        return self.arg
+
+    def evaluate(self) -> AnyMat:
+        return invertMat(self.arg.evaluate())
+
+    def __repr__(self) -> str:
+        return f'Inverse({self.arg!r})'
+
+class Product(Expr):
+    """Chain of factors; nested products are flattened on construction."""
+
+    __slots__ = ('factors',)
+
+    def __init__(self, factors: List[Expr]) -> None:
+        flat = []
+        for f in factors:
+            flat.extend(f.factors if isinstance(f, Product) else [f])
+        for left, right in zip(flat, flat[1:]):
+            if left.shape[1] != right.shape[0]:
+                raise ValueError(f'Shape mismatch: {left.shape} @ {right.shape}.')
+        self.factors = flat
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (self.factors[0].shape[0], self.factors[-1].shape[1])
+
+    def __repr__(self) -> str:
+        return ' @ '.join(map(repr, self.factors))
+
+    def evaluate(self) -> Any:
+        # Compose neighbouring permutations first.
+        factors = []
+        for f in self.factors:
+            if factors and _isPerm(f) and _isPerm(factors[-1]):
+                factors[-1] = Leaf(factors[-1].mat @ f.mat)
+            else:
+                factors.append(f)
+        if len(factors) == 1:
+            return factors[0].evaluate()
+        lead = factors.pop(0).mat if _isPerm(factors[0]) else None
+        trail = factors.pop().mat if _isPerm(factors[-1]) else None
+        # Each inner permutation folds into the factor after it.
+        operands = []
+        perm = None
+        for f in factors:
+            if _isPerm(f):
+                perm = f.mat
+                continue
+            if perm is not None:
+                if isinstance(f, Inverse):
+                    # P inv(A) = inv(A P^T): permute A's columns instead.
+                    f = Inverse(Leaf(f.arg.evaluate() @ perm.T))
+                else:
+                    f = Leaf(perm @ f.evaluate())
+                perm = None
+            operands.append(f)
+        value = _evalChain(operands)
+        if lead is not None:
+            value = lead @ value
+        if trail is not None:
+            value = value @ trail
+        return value
+
+def _isPerm(f: Expr) -> bool:
+    return isinstance(f, Leaf) and isinstance(f.mat, PermMatrix)
+
+def _chainOrder(dims: List[int]) -> Tuple[int, List[List[int]]]:
+    """Multiply-add count of the best order for a chain with these dims,
+    and split[i][j], where the product of factors i..j splits in two."""
+    k = len(dims) - 1
+    cost = [[0]*k for _ in range(k)]
+    split = [[0]*k for _ in range(k)]
+    for length in range(1, k):
+        for i in range(k - length):
+            j = i + length
+            best = None
+            for s in range(i, j):
+                c = cost[i][s] + cost[s+1][j] + dims[i]*dims[s+1]*dims[j+1]
+                if best is None or c < best:
+                    best = c
+                    split[i][j] = s
+            cost[i][j] = best
+    return cost[0][k-1], split
+
+def _multChain(mats: List[AnyMat]) -> AnyMat:
+    dims = [_shape(m)[0] for m in mats] + [_shape(mats[-1])[1]]
+    _, split = _chainOrder(dims)
+    def mult(i: int, j: int) -> AnyMat:
+        if i == j:
+            return mats[i]
+        s = split[i][j]
+        return multMat(mult(i, s), mult(s+1, j))
+    return mult(0, len(mats)-1)
+
+def _evalChain(operands: List[Expr]) -> AnyMat:
+    """Product of operands free of permutations.
+
+    Inverses are resolved right to left: each one solves against the
+    product of everything to its right.
+    """
+    if isinstance(operands[-1], Inverse):
+        # Trailing inverse: B inv(A) = (inv(A^T) B^T)^T.
+        a = operands[-1].arg.evaluate()
+        if len(operands) == 1:
+            return invertMat(a)
+        rest = _evalChain(operands[:-1])
+        return _transpose(solveMat(_transpose(a), _transpose(rest)))
+    run = []
+    for f in reversed(operands):
+        if isinstance(f, Inverse):
+            run.reverse()
+            run = [solveMat(f.arg.evaluate(), _multChain(run))]
+        else:
+            run.append(f.evaluate())
+    run.reverse()
+    return _multChain(run)
+
+def lazy(mat: Any) -> Expr:
+    """Expr for mat; an Expr comes back as is."""
+    if isinstance(mat, Expr):
+        return mat
+    return Leaf(mat)
+
+def _runTest() -> None:
+    import random
+    from matrix import isMatEqual, permToMat
+    assert _chainOrder([10, 30, 5, 60])[0] == 4500
+    assert _chainOrder([40, 20, 30, 10, 30])[0] == 26000
+    def rand(m: int, n: int) -> List[List[float]]:
+        return [[random.random()*2.0 - 1.0 for j in range(n)] for i in range(m)]
+    def invertible(n: int) -> List[List[float]]:
+        # Diagonally dominant, so inverses stay small and the absolute
+        # tolerance of isMatEqual holds.
+        mat = rand(n, n)
+        for i in range(n):
+            mat[i][i] += n
+        return mat
+    def perm(n: int) -> PermMatrix:
+        p = list(range(n))
+        random.shuffle(p)
+        return PermMatrix(p)
+    def eager(f: Expr) -> AnyMat:
+        if isinstance(f, Leaf):
+            return permToMat(f.mat.p) if isinstance(f.mat, PermMatrix) else f.mat
+        if isinstance(f, Inverse):
+            return invertMat(eager(f.arg))
+        value = eager(f.factors[0])
+        for g in f.factors[1:]:
+            value = multMat(value, eager(g))
+        return value
+    n = 6
+    for _ in range(200):
+        factors = []
+        rows = n
+        for _ in range(random.randrange(1, 6)):
+            kind = random.random()
+            if kind < 0.3:
+                factors.append(lazy(perm(rows)))
+            elif kind < 0.5:
+                factors.append(lazy(invertible(rows)).inverse())
+            else:
+                cols = random.choice((n, 2, 9))
+                factors.append(lazy(rand(rows, cols)))
+                rows = cols
+        if random.random() < 0.3:
+            factors = [lazy(Matrix.fromRows(matRows(eager(f)))) if isinstance(f, Leaf) and not _isPerm(f) else f for f in factors]
+        expr = factors[0]
+        for f in factors[1:]:
+            expr = expr @ f
+        got = expr.evaluate()
+        expected = eager(expr)
+        if not isMatEqual(matRows(got), matRows(expected)):
+            print('Expr:', expr)
+            return
+    lu = lazy(invertible(5))
+    assert isMatEqual(matRows((lu.inverse() @ lu).evaluate()), permToMat(list(range(5))))
+    assert (lazy(perm(4)) @ perm(4)).evaluate().shape == (4, 4)
+    try:
+        lazy(rand(2, 3)) @ rand(2, 3)
+        assert False
+    except ValueError:
+        pass
+    print('Nice!')
+
+if __name__ == '__main__':
+    _runTest()
@@ -1,14 +1,300 @@
-from itertools import product
-from typing import List
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from itertools import chain, product
+from math import ceil, sumprod
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 from permutation import (
     Perm,
+    Permutation,
+    invertPermSimple,
     permute
 )
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 Vec = List[float]
 Mat = List[Vec]
 
-def matToString(mat: Mat) -> str:
+def _span(start: int, count: int, step: int) -> slice:
+    """Slice of count items from start, step apart (step may be negative)."""
+    if count == 0:
+        return slice(start, start)
+    stop = start + (count-1)*step + (1 if step > 0 else -1)
+    return slice(start, None if stop < 0 else stop, step)
+
+# array('d') is native-endian.
+_TYPESTR = ('<' if sys.byteorder == 'little' else '>') + 'f8'
+
+def _arrayInterface(
+    data: array,
+    offset: int,
+    shape: Tuple[int, ...],
+    strides: Tuple[int, ...],
+) -> Dict[str, Any]:
+    address = data.buffer_info()[0] + offset*data.itemsize
+    return {
+        'version': 3,
+        'shape': shape,
+        'typestr': _TYPESTR,
+        'data': (address, False),
+        'strides': tuple(s*data.itemsize for s in strides),
+    }
+
+class Vector:
+    """Zero-copy view of count doubles in data, stride apart.
+
+    Rows and columns of a Matrix are Vectors. Slices are views too; use
+    tolist() or array('d', v) for a copy.
+    """
+
+    __slots__ = ('data', 'count', 'stride', 'offset')
+
+    def __init__(self, data: array, count: int, stride: int = 1, offset: int = 0) -> None:
+        self.data = data
+        self.count = count
+        self.stride = stride
+        self.offset = offset
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _slice(self) -> slice:
+        return _span(self.offset, self.count, self.stride)
+
+    def _index(self, i: int) -> int:
+        if not -self.count <= i < self.count:
+            raise IndexError('Vector index out of range')
+        return self.offset + (i % self.count)*self.stride
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[float, 'Vector']:
+        if isinstance(i, slice):
+            r = range(*i.indices(self.count))
+            return Vector(self.data, len(r), self.stride*r.step, self.offset + r.start*self.stride)
+        return self.data[self._index(i)]
+
+    def __setitem__(self, i: Union[int, slice], value: Any) -> None:
+        if isinstance(i, slice):
+            view = self[i]
+            values = array('d', value)
+            if len(values) != view.count:
+                raise ValueError(f'Cannot resize a Vector: {len(values)} values for {view.count} slots.')
+            self.data[view._slice()] = values
+        else:
+            self.data[self._index(i)] = value
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.data[self._slice()])
+
+    def tolist(self) -> Vec:
+        return self.data[self._slice()].tolist()
+
+    def __repr__(self) -> str:
+        return f'Vector({self.tolist()})'
+
+    def __buffer__(self, flags: int) -> memoryview:
+        if self.stride != 1:
+            raise BufferError('Strided Vector; export a copy: array(\'d\', v).')
+        return memoryview(self.data)[self._slice()]
+
+    @property
+    def __array_interface__(self) -> Dict[str, Any]:
+        return _arrayInterface(self.data, self.offset, (self.count,), (self.stride,))
+
+class Matrix:
+    """Dense matrix of doubles in one flat array('d').
+
+    Element (i, j) is data[offset + i*strides[0] + j*strides[1]], so
+    transpose(), row(), col(), submatrix() and slicing all return views
+    sharing data. m[i] is a row Vector, so m[i][j] works as for Mat;
+    m[i, j] skips the row view.
+
+    NumPy takes any Matrix without copying, through __array_interface__.
+    memoryview() works on row-major contiguous ones; copy() the rest.
+    """
+
+    __slots__ = ('data', 'shape', 'strides', 'offset')
+
+    def __init__(
+        self,
+        rows: int,
+        cols: int,
+        data: Optional[array] = None,
+        strides: Optional[Tuple[int, int]] = None,
+        offset: int = 0,
+    ) -> None:
+        if data is None:
+            data = array('d', bytes(8*rows*cols))
+        self.data = data
+        self.shape = (rows, cols)
+        self.strides = (cols, 1) if strides is None else strides
+        self.offset = offset
+
+    @classmethod
+    def zeros(cls, rows: int, cols: int) -> 'Matrix':
+        return cls(rows, cols)
+
+    @classmethod
+    def identity(cls, n: int) -> 'Matrix':
+        mat = cls(n, n)
+        mat.data[::n+1] = array('d', [1.0])*n
+        return mat
+
+    @classmethod
+    def fromRows(cls, rows: Any) -> 'Matrix':
+        data = array('d')
+        for row in rows:
+            data.extend(row)
+        m = len(rows)
+        n = len(data) // m if m else 0
+        if len(data) != m*n:
+            raise ValueError('Rows of different lengths.')
+        return cls(m, n, data)
+
+    def toRows(self) -> Mat:
+        return [self.data[self._rowSlice(i)].tolist() for i in range(self.shape[0])]
+
+    def copy(self) -> 'Matrix':
+        """Row-major contiguous copy."""
+        if self.isContiguous():
+            m, n = self.shape
+            return Matrix(m, n, self.data[self.offset:self.offset + m*n])
+        return Matrix.fromRows([self.data[self._rowSlice(i)] for i in range(self.shape[0])])
+
+    def isContiguous(self) -> bool:
+        m, n = self.shape
+        return (m <= 1 or self.strides[0] == n) and (n <= 1 or self.strides[1] == 1)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def _rowSlice(self, i: int) -> slice:
+        return _span(self.offset + i*self.strides[0], self.shape[1], self.strides[1])
+
+    def _axis(self, key: Union[int, slice], axis: int) -> Tuple[int, Optional[int], int]:
+        """Offset delta, count (None for an index) and stride of key on axis."""
+        size = self.shape[axis]
+        stride = self.strides[axis]
+        if isinstance(key, slice):
+            r = range(*key.indices(size))
+            return r.start*stride, len(r), r.step*stride
+        if not -size <= key < size:
+            raise IndexError('Matrix index out of range')
+        return (key % size)*stride, None, stride
+
+    def __getitem__(self, key: Any) -> Union[float, Vector, 'Matrix']:
+        if isinstance(key, int):
+            # Fast path for m[i][j].
+            m, n = self.shape
+            if not -m <= key < m:
+                raise IndexError('Matrix index out of range')
+            return Vector(self.data, n, self.strides[1], self.offset + (key % m)*self.strides[0])
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        rowDelta, rows, rowStride = self._axis(key[0], 0)
+        colDelta, cols, colStride = self._axis(key[1], 1)
+        offset = self.offset + rowDelta + colDelta
+        if rows is None and cols is None:
+            return self.data[offset]
+        if rows is None:
+            return Vector(self.data, cols, colStride, offset)
+        if cols is None:
+            return Vector(self.data, rows, rowStride, offset)
+        return Matrix(rows, cols, self.data, (rowStride, colStride), offset)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        view = self[key]
+        if isinstance(view, float):
+            self.data[self.offset + self._axis(key[0], 0)[0] + self._axis(key[1], 1)[0]] = value
+        elif isinstance(view, Vector):
+            view[:] = value
+        else:
+            rows = matRows(value)
+            if len(rows) != view.shape[0]:
+                raise ValueError(f'Cannot resize a Matrix: {len(rows)} rows for {view.shape[0]}.')
+            for i, row in enumerate(rows):
+                view[i] = row
+
+    def __iter__(self) -> Iterator[Vector]:
+        for i in range(self.shape[0]):
+            yield self[i]
+
+    def row(self, i: int) -> Vector:
+        return self[i, :]
+
+    def col(self, j: int) -> Vector:
+        return self[:, j]
+
+    def submatrix(self, r0: int, r1: int, c0: int, c1: int) -> 'Matrix':
+        """View of rows [r0, r1) and columns [c0, c1)."""
+        return self[r0:r1, c0:c1]
+
+    def transpose(self) -> 'Matrix':
+        m, n = self.shape
+        return Matrix(n, m, self.data, self.strides[::-1], self.offset)
+
+    @property
+    def T(self) -> 'Matrix':
+        return self.transpose()
+
+    def swapRows(self, i: int, j: int) -> None:
+        rowI, rowJ = self._rowSlice(i), self._rowSlice(j)
+        self.data[rowI], self.data[rowJ] = self.data[rowJ], self.data[rowI]
+
+    def permuteRows(self, p: Perm) -> None:
+        """Move row i to row p[i], like permuteMatRows, one slice per row."""
+        gather = invertPermSimple(p)
+        rows = [self.data[self._rowSlice(g)] for g in gather]
+        for i, row in enumerate(rows):
+            self.data[self._rowSlice(i)] = row
+
+    def __repr__(self) -> str:
+        return f'Matrix({self.toRows()})'
+
+    def __buffer__(self, flags: int) -> memoryview:
+        m, n = self.shape
+        if not self.isContiguous() or m*n == 0:
+            raise BufferError('Empty or strided Matrix; export copy() or use NumPy.')
+        view = memoryview(self.data)[self.offset:self.offset + m*n]
+        return view.cast('B').cast('d', [m, n])
+
+    @property
+    def __array_interface__(self) -> Dict[str, Any]:
+        return _arrayInterface(self.data, self.offset, self.shape, self.strides)
+
+AnyMat = Union[Mat, Matrix]
+
+def matRows(mat: Any) -> Mat:
+    """mat as a list of row lists; a Mat comes back as is."""
+    if isinstance(mat, Matrix):
+        return mat.toRows()
+    if isinstance(mat, PermMatrix):
+        return mat.toMat()
+    return mat
+
+def copyMat(mat: AnyMat) -> AnyMat:
+    if isinstance(mat, Matrix):
+        return mat.copy()
+    return deepcopy(mat)
+
+def identityMat(n: int, like: Any = None) -> AnyMat:
+    if isinstance(like, Matrix):
+        return Matrix.identity(n)
+    return [[1.0 if i == j else 0.0 for j in range(n)] for i in range(n)]
+
+def swapMatRows(mat: AnyMat, i: int, j: int) -> None:
+    if isinstance(mat, Matrix):
+        mat.swapRows(i, j)
+    else:
+        mat[i], mat[j] = mat[j], mat[i]
+
+def matToString(mat: AnyMat) -> str:
     s = ''
     for row in mat:
         s += '[' + ','.join(map(lambda x: f'{x: .10f}', row)) + '],\n'
@@ -17,7 +303,46 @@ def matToString(mat: Mat) -> str:
 def dot(v1: Vec, v2: Vec) -> float:
     return sum(i1 * i2 for i1, i2 in zip(v1, v2))
 
-def multMat(m1: Mat, m2: Mat) -> Mat:
+# Output tile edge for _multBlocked: a tile's packed columns stay hot
+# while every row of the tile sweeps them.
+_BLOCK = 64
+
+def _multNumpy(m1: AnyMat, m2: AnyMat) -> Optional[AnyMat]:
+    """NumPy product, or None if either factor is not numeric.
+
+    All-integer products stay in Python, where ints cannot overflow.
+    """
+    a = np.asarray(m1)
+    b = np.asarray(m2)
+    if a.ndim != 2 or b.ndim != 2 or a.dtype.kind not in 'biufc' or b.dtype.kind not in 'biufc':
+        return None
+    if a.dtype.kind in 'biu' and b.dtype.kind in 'biu':
+        return None
+    c = a @ b
+    if isinstance(m1, Matrix) or isinstance(m2, Matrix):
+        if c.dtype.kind != 'f':
+            return None
+        return Matrix(c.shape[0], c.shape[1], array('d', c.astype(np.float64, copy=False).tobytes()))
+    return c.tolist()
+
+def _multBlocked(a: Mat, bCols: Sequence[Vec]) -> Mat:
+    """a times the matrix whose columns are bCols, tile by tile.
+
+    Each cell is one C-level sumprod over a row of a and a packed column,
+    with no per-element Python indexing.
+    """
+    m = len(a)
+    n = len(bCols)
+    c = [[0.0]*n for _ in range(m)]
+    for j0 in range(0, n, _BLOCK):
+        cols = bCols[j0:j0+_BLOCK]
+        j1 = j0 + len(cols)
+        for i in range(m):
+            row = a[i]
+            c[i][j0:j1] = [sumprod(row, col) for col in cols]
+    return c
+
+def multMatSimple(m1: Mat, m2: Mat) -> Mat:
     m = len(m1)
     n = len(m2[0])
     p = len(m1[0]) # == len(m2)
@@ -26,7 +351,118 @@ def multMat(m1: Mat, m2: Mat) -> Mat:
         for j in range(n)]
         for i in range(m)]
 
-def isMatIdentity(mat: Mat) -> bool:
+def multMat(m1: AnyMat, m2: AnyMat) -> AnyMat:
+    """Product; a Matrix if either factor is one.
+
+    Uses NumPy when installed and the factors are numeric. Otherwise m2 is
+    transposed once into packed columns and the output is built in
+    _BLOCK-wide column tiles. A PermMatrix factor only reorders the other.
+    """
+    if isinstance(m1, PermMatrix) or isinstance(m2, PermMatrix):
+        return m1 @ m2
+    if np is not None:
+        c = _multNumpy(m1, m2)
+        if c is not None:
+            return c
+    if isinstance(m2, Matrix):
+        bCols = m2.T.toRows()
+    else:
+        bCols = list(zip(*m2))
+    c = _multBlocked(matRows(m1), bCols)
+    if isinstance(m1, Matrix) or isinstance(m2, Matrix):
+        return Matrix.fromRows(c)
+    return c
+
+# Products with fewer multiply-adds run serially; below this, starting
+# processes costs more than they save.
+_PARALLEL_MIN = 128**3
+
+def _flatFloats(mat: AnyMat) -> Optional[array]:
+    """Row-major array('d') of mat, or None unless every element is a float."""
+    if isinstance(mat, Matrix):
+        return mat.copy().data
+    if not all(type(x) is float for row in mat for x in row):
+        return None
+    return array('d', chain.from_iterable(mat))
+
+def _multRowsShared(name: str, m: int, p: int, n: int, i0: int, i1: int) -> None:
+    """Rows [i0, i1) of C = A B, all three living in shared memory name.
+
+    The block holds A (m x p), then B transposed (n x p), then C (m x n).
+    """
+    shm = SharedMemory(name)
+    try:
+        view = shm.buf.cast('d')
+        try:
+            bOff, cOff = m*p, m*p + n*p
+            if np is not None:
+                flat = np.frombuffer(view, dtype=np.float64)
+                a = flat[i0*p:i1*p].reshape(i1 - i0, p)
+                bT = flat[bOff:cOff].reshape(n, p)
+                flat[cOff + i0*n:cOff + i1*n] = (a @ bT.T).ravel()
+                del flat, a, bT
+                return
+            aRows = [view[i*p:(i+1)*p].tolist() for i in range(i0, i1)]
+            bCols = [view[bOff + j*p:bOff + (j+1)*p].tolist() for j in range(n)]
+            c = _multBlocked(aRows, bCols)
+            view[cOff + i0*n:cOff + i1*n] = array('d', chain.from_iterable(c))
+        finally:
+            view.release()
+    finally:
+        shm.close()
+
+def multMatParallel(
+    m1: AnyMat,
+    m2: AnyMat,
+    *,
+    maxWorkers: Optional[int] = None,
+    threshold: int = _PARALLEL_MIN,
+) -> AnyMat:
+    """multMat with output row blocks spread over worker processes.
+
+    Both factors and the result sit in one shared memory block, so
+    workers get only a name and a row range. Small products (fewer than
+    threshold multiply-adds), a single worker and non-float elements all
+    take the serial multMat. Without NumPy, workers run the same kernel
+    as multMat and the results are identical. With NumPy, they multiply
+    row blocks, and BLAS may round differently than for the whole
+    product, so results agree only to rounding.
+    """
+    m, p = len(m1), len(m2)
+    n = len(m2[0]) if p else 0
+    workers = maxWorkers or os.cpu_count() or 1
+    if workers == 1 or m*p*n == 0 or m*p*n < threshold:
+        return multMat(m1, m2)
+    a = _flatFloats(m1)
+    bT = _flatFloats(m2.T if isinstance(m2, Matrix) else list(zip(*m2)))
+    if a is None or bT is None:
+        return multMat(m1, m2)
+    shm = SharedMemory(create=True, size=8*(m*p + n*p + m*n))
+    try:
+        view = shm.buf.cast('d')
+        try:
+            view[:m*p] = a
+            view[m*p:m*p + n*p] = bT
+            # A few blocks per worker evens out stragglers.
+            step = ceil(m / (4*workers))
+            with ProcessPoolExecutor(workers) as executor:
+                futures = [
+                    executor.submit(_multRowsShared, shm.name, m, p, n, i0, min(i0 + step, m))
+                    for i0 in range(0, m, step)]
+                for future in futures:
+                    future.result()
+            c = array('d', view[m*p + n*p:])
+        finally:
+            view.release()
+    finally:
+        shm.close()
+        shm.unlink()
+    if isinstance(m1, Matrix) or isinstance(m2, Matrix):
+        return Matrix(m, n, c)
+    return [c[i*n:(i+1)*n].tolist() for i in range(m)]
+
+def isMatIdentity(mat: AnyMat) -> bool:
+    mat = matRows(mat)
     m = len(mat)
     n = len(mat[0])
     if m != n:
@@ -37,7 +473,8 @@ def isMatIdentity(mat: Mat) -> bool:
             return False
     return True
 
-def isMatEqual(m1: Mat, m2: Mat) -> bool:
+def isMatEqual(m1: AnyMat, m2: AnyMat) -> bool:
+    m1, m2 = matRows(m1), matRows(m2)
     m = len(m1)
     n = len(m1[0])
     if m != len(m2) or n != len(m2[0]):
@@ -54,14 +491,236 @@ def permToMat(p: Perm) -> Mat:
         mat[i][j] = 1.0
     return mat
 
-def permuteMatRows(p: Perm, mat: Mat) -> None:
+def permuteMatRows(p: Perm, mat: AnyMat) -> None:
+    if isinstance(mat, Matrix):
+        mat.permuteRows(p)
+        return
     permute(p, arr=mat)
 
-def permuteMatCols(p: Perm, mat: Mat) -> None:
-    n = len(p)
-    def read(key):
-        return [mat[rowId][key] for rowId in range(n)]
-    def write(key, value):
-        for rowId in range(n):
-            mat[rowId][key] = value[rowId]
-    permute(p, read=read, write=write)
\ No newline at end of file
+def permuteMatCols(p: Perm, mat: AnyMat) -> None:
+    if isinstance(mat, Matrix):
+        mat.T.permuteRows(p)
+        return
+    # Column i moves to p[i]: one C-level gather per row.
+    gather = invertPermSimple(p)
+    for row in mat:
+        row[:] = map(row.__getitem__, gather)
+
+class PermMatrix:
+    """The permutation matrix permToMat(p), without the n x n floats.
+
+    P @ A takes row p[i] of A as row i; A @ P moves column i of A to
+    column p[i]. Both are O(n) gathers per row, not O(n^3) products, and
+    return a new matrix of A's kind. P @ Q is again a PermMatrix, and
+    so are P.T and P.inverse(), which are the same.
+
+    Backed by a Permutation, which validates p and supplies composition,
+    inversion and the cached gather for columns.
+    """
+
+    __slots__ = ('perm',)
+
+    def __init__(self, p: Union[Perm, Permutation]) -> None:
+        self.perm = p if isinstance(p, Permutation) else Permutation(p)
+
+    @classmethod
+    def identity(cls, n: int) -> 'PermMatrix':
+        return cls(list(range(n)))
+
+    @property
+    def p(self) -> Perm:
+        return self.perm.p
+
+    def __len__(self) -> int:
+        return len(self.perm)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (len(self.perm), len(self.perm))
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PermMatrix) and self.perm == other.perm
+
+    def __repr__(self) -> str:
+        return f'PermMatrix({self.p})'
+
+    def inverse(self) -> 'PermMatrix':
+        return PermMatrix(self.perm.inverse())
+
+    @property
+    def T(self) -> 'PermMatrix':
+        return self.inverse()
+
+    def toMat(self) -> Mat:
+        return permToMat(self.p)
+
+    def __matmul__(self, other: Any) -> Any:
+        if isinstance(other, PermMatrix):
+            # Row i of P Q A is row q[p[i]] of A: apply p, then q.
+            return PermMatrix(self.perm.compose(other.perm))
+        if not hasattr(other, '__len__'):
+            return NotImplemented
+        n = len(self.perm)
+        if len(other) != n:
+            raise ValueError(f'Shape mismatch: {n} x {n} @ {len(other)} rows.')
+        if isinstance(other, Matrix):
+            data = array('d')
+            for i in self.p:
+                data.extend(other.data[other._rowSlice(i)])
+            return Matrix(n, other.shape[1], data)
+        return [list(other[i]) for i in self.p]
+
+    def __rmatmul__(self, other: Any) -> Any:
+        gather = self.perm.gather()
+        if isinstance(other, Matrix):
+            if other.shape[1] != len(gather):
+                raise ValueError(f'Shape mismatch: {other.shape} @ {self.shape}.')
+            data = array('d')
+            for i in range(other.shape[0]):
+                row = other.data[other._rowSlice(i)]
+                data.extend(map(row.__getitem__, gather))
+            return Matrix(other.shape[0], len(gather), data)
+        if other and len(other[0]) != len(gather):
+            raise ValueError(f'Shape mismatch: {len(other[0])} columns @ {self.shape}.')
+        return [list(map(row.__getitem__, gather)) for row in other]
+
+def _runTest() -> None:
+    import random
+    rows = [[random.random() for j in range(5)] for i in range(4)]
+    mat = Matrix.fromRows(rows)
+    assert mat.toRows() == rows and mat.shape == (4, 5)
+    assert mat[2][3] == mat[2, 3] == rows[2][3]
+    assert mat.T.toRows() == [list(col) for col in zip(*rows)]
+    assert mat.col(1).tolist() == [row[1] for row in rows]
+    sub = mat.submatrix(1, 3, 2, 5)
+    assert sub.toRows() == [row[2:5] for row in rows[1:3]]
+    assert mat[::2, ::-2].toRows() == [row[::-2] for row in rows[::2]]
+    assert sub.T[1].tolist() == [row[3] for row in rows[1:3]]
+    sub[0, 0] = -1.0
+    sub.T[2] = [7.0, 8.0]
+    rows[1][2] = -1.0
+    rows[1][4], rows[2][4] = 7.0, 8.0
+    assert mat.toRows() == rows
+    assert not sub.isContiguous() and sub.copy().toRows() == sub.toRows()
+    assert memoryview(mat).tolist() == rows
+    assert mat.__array_interface__['typestr'][0] == ('<' if sys.byteorder == 'little' else '>')
+    assert mat.row(1)[1:4].tolist() == rows[1][1:4]
+    p = [2, 0, 3, 1]
+    permuteMatRows(p, mat)
+    permuteMatRows(p, rows)
+    assert mat.toRows() == rows
+    q = [4, 2, 0, 1, 3]
+    permuteMatCols(q, mat)
+    cols = [list(col) for col in zip(*rows)]
+    permute(q, arr=cols)
+    assert mat.toRows() == [list(row) for row in zip(*cols)]
+    other = [[random.random() for j in range(3)] for i in range(5)]
+    prod = multMat(mat, Matrix.fromRows(other))
+    assert isinstance(prod, Matrix) and isMatEqual(prod, multMat(mat.toRows(), other))
+    assert isMatEqual(multMat(mat.T, mat), multMat(mat.T.toRows(), mat.toRows()))
+    assert isMatIdentity(Matrix.identity(3))
+    for m, p, n in ((1, 1, 1), (3, 70, 2), (65, 7, 130)):
+        a = [[random.randrange(-9, 10) for j in range(p)] for i in range(m)]
+        b = [[random.random() for j in range(n)] for i in range(p)]
+        ones = [[1]*m for _ in range(p)]
+        assert multMat(a, ones) == multMatSimple(a, ones)
+        assert isMatEqual(multMat(a, b), multMatSimple(a, b))
+        assert isMatEqual(multMat(Matrix.fromRows(a).T.T, b), multMatSimple(a, b))
+    a = [[random.random() for j in range(33)] for i in range(21)]
+    b = [[random.random() for j in range(17)] for i in range(33)]
+    # Bit-identical only on the pure Python kernel; see multMatParallel.
+    same = isMatEqual if np is not None else lambda x, y: x == y
+    assert same(multMatParallel(a, b, maxWorkers=3, threshold=0), multMat(a, b))
+    c = multMatParallel(Matrix.fromRows(a), Matrix.fromRows(b).T.T, maxWorkers=2, threshold=0)
+    assert isinstance(c, Matrix) and same(c.toRows(), matRows(multMat(a, b)))
+    assert multMatParallel(a[:0], b, maxWorkers=2, threshold=0) == []
+    ints = [[1, 2], [3, 4]]
+    assert multMatParallel(ints, ints, maxWorkers=2, threshold=0) == [[7, 10], [15, 22]]
+    p = [3, 0, 4, 1, 2]
+    q = [1, 2, 0, 4, 3]
+    P, Q = PermMatrix(p), PermMatrix(q)
+    sq = [[random.random() for j in range(5)] for i in range(5)]
+    for A in (sq, Matrix.fromRows(sq)):
+        assert isMatEqual(P @ A, multMatSimple(permToMat(p), sq))
+        assert isMatEqual(A @ P, multMatSimple(sq, permToMat(p)))
+        assert isMatEqual(multMat(P, A), P @ A) and isMatEqual(multMat(A, P), A @ P)
+        assert type(P @ A) is type(A) and type(A @ P) is type(A)
+    assert isMatEqual(P @ Q, multMatSimple(permToMat(p), permToMat(q)))
+    assert P @ P.T == PermMatrix.identity(5) and PermMatrix(P.perm) == P
+    try:
+        PermMatrix([-1, 0])
+        assert False
+    except ValueError:
+        pass
+    assert (P @ P.T).p == list(range(5)) and P.T.toMat() == [list(col) for col in zip(*P.toMat())]
+    moved = [list(row) for row in sq]
+    permuteMatCols(p, moved)
+    assert isMatEqual(moved, multMatSimple(sq, permToMat(p)))
+    swapMatRows(mat, 0, 3)
+    assert mat[0].tolist() == [list(row) for row in zip(*cols)][3]
+    print('Nice!')
+
+def _runBenchmark() -> None:
+    """Time one n x n product per engine and size.
+
+    An engine that takes over a second is skipped at larger sizes.
+    """
+    import random
+    import sys
+    from time import perf_counter
+    engines = {
+        'simple': multMatSimple,
+        'blocked': lambda a, b: _multBlocked(a, list(zip(*b))),
+        'Matrix': lambda a, b: multMat(Matrix.fromRows(a), Matrix.fromRows(b)),
+    }
+    if np is not None:
+        engines['numpy'] = _multNumpy
+    print(f'{"n":>6}' + ''.join(f'{name:>12}' for name in engines))
+    slow = set()
+    for n in (16, 32, 64, 128, 256, 512):
+        a = [[random.random() for j in range(n)] for i in range(n)]
+        b = [[random.random() for j in range(n)] for i in range(n)]
+        line = f'{n:>6}'
+        for name, mult in engines.items():
+            if name in slow:
+                line += f'{"-":>12}'
+                continue
+            if name == 'Matrix' and np is not None:
+                line += f'{"(numpy)":>12}'
+                continue
+            start = perf_counter()
+            mult(a, b)
+            elapsed = perf_counter() - start
+            if elapsed > 1.0:
+                slow.add(name)
+            line += f'{elapsed:>11.4f}s'
+        print(line)
+        sys.stdout.flush()
+
+def _runParallelBenchmark() -> None:
+    """Speedup of multMatParallel over serial multMat per worker count."""
+    import random
+    from time import perf_counter
+    counts = sorted({1, 2, 4, 8, os.cpu_count() or 1})
+    print(f'cpus: {os.cpu_count()}')
+    print(f'{"n":>6}{"serial":>10}' + ''.join(f'{w:>9}w' for w in counts))
+    for n in (128, 256, 384):
+        a = [[random.random() for j in range(n)] for i in range(n)]
+        start = perf_counter()
+        multMat(a, a)
+        serial = perf_counter() - start
+        line = f'{n:>6}{serial:>9.3f}s'
+        for workers in counts:
+            start = perf_counter()
+            multMatParallel(a, a, maxWorkers=workers, threshold=0)
+            line += f'{serial / (perf_counter() - start):>9.2f}x'
+        print(line)
+
+if __name__ == '__main__':
+    import sys
+    if sys.argv[1:] == ['bench']:
+        _runBenchmark()
+    elif sys.argv[1:] == ['bench', 'parallel']:
+        _runParallelBenchmark()
+    else:
+        _runTest()
@@ -1,24 +1,197 @@
+import mmap
+import os
+from array import array
 from copy import deepcopy
+from math import lcm
 from random import shuffle
-from typing import List, Callable, Any
+from typing import List, Callable, Any, Optional, Sequence
 
 Perm = List[int]
+BatchRead = Callable[[List[int]], List[Any]]
+BatchWrite = Callable[[List[int], List[Any]], None]
+
+class Permutation:
+    """Permutation with its cycle decomposition computed once.
+
+    Same convention as permute: applying it moves arr[i] to arr[p[i]].
+    Non-trivial cycles are stored back to back in one array, with their
+    start offsets in another; fixed points are dropped.
+
+    p is copied and never written, so one Permutation can be applied from
+    several threads at once.
+    """
+
+    __slots__ = ('p', '_cycles', '_offsets', '_gather')
+
+    def __init__(self, p: Perm) -> None:
+        n = len(p)
+        self.p = list(p)
+        self._cycles = array('q')
+        self._offsets = array('q', [0])
+        # Built on first apply: new arr[j] is old arr[_gather[j]].
+        self._gather = None
+        visited = bytearray(n)
+        for i in range(n):
+            if visited[i] or p[i] == i:
+                continue
+            curr = i
+            while not visited[curr]:
+                visited[curr] = 1
+                self._cycles.append(curr)
+                curr = p[curr]
+                if not 0 <= curr < n:
+                    raise ValueError('Not a permutation.')
+            if curr != i:
+                raise ValueError('Not a permutation.')
+            self._offsets.append(len(self._cycles))
+
+    def __len__(self) -> int:
+        return len(self.p)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Permutation) and self.p == other.p
+
+    def __repr__(self) -> str:
+        return f'Permutation({self.p})'
+
+    def cycles(self) -> List[List[int]]:
+        """Non-trivial cycles, each listed as i, p[i], p[p[i]], ..."""
+        offsets = self._offsets
+        return [self._cycles[offsets[c]:offsets[c+1]].tolist() for c in range(len(offsets)-1)]
+
+    def gather(self) -> Perm:
+        """Cached g with new arr[j] = old arr[g[j]] after apply. Do not modify."""
+        if self._gather is None:
+            self._gather = self._inverseList()
+        return self._gather
+
+    def apply(self, arr: List[Any]) -> None:
+        """Same result as permute(p, arr=arr).
+
+        Gathers through the cached inverse and writes back with one slice
+        assignment for lists, which beats a Python-level cycle walk.
+        """
+        values = list(map(arr.__getitem__, self.gather()))
+        if isinstance(arr, list):
+            arr[:len(values)] = values
+        else:
+            for i in self._cycles:
+                arr[i] = values[i]
+
+    def applyWith(self, read: Callable[[int], Any], write: Callable[[int, Any], None]) -> None:
+        """In-place permute(p, read=read, write=write), one cycle at a time."""
+        cycles = self._cycles
+        offsets = self._offsets
+        for c in range(len(offsets)-1):
+            first, last = offsets[c], offsets[c+1]
+            prevValue = read(cycles[first])
+            for k in range(first+1, last):
+                curr = cycles[k]
+                temp = read(curr)
+                write(curr, prevValue)
+                prevValue = temp
+            write(cycles[first], prevValue)
+
+    def applyBatched(self, read: BatchRead, write: BatchWrite, batchSize: int = 4096) -> None:
+        """In-place permute through batch callbacks.
+
+        read(indices) returns one value per index, e.g. a row across several
+        columns, and write(indices, values) stores them. Whole cycles are
+        grouped into batches of up to batchSize indices. Longer cycles are
+        streamed in chunks, carrying one value across chunk boundaries, so
+        memory stays O(batchSize).
+        """
+        cycles = self._cycles
+        offsets = self._offsets
+        p = self.p
+        group: List[int] = []
+        def flush() -> None:
+            if group:
+                values = read(group)
+                write([p[i] for i in group], values)
+                group.clear()
+        for c in range(len(offsets)-1):
+            first, last = offsets[c], offsets[c+1]
+            if last - first <= batchSize:
+                if len(group) + last - first > batchSize:
+                    flush()
+                group.extend(cycles[first:last])
+                continue
+            flush()
+            # Each chunk writes its old values one step along the cycle; the
+            # head of the cycle gets the last value once the walk is done.
+            carry = None
+            for start in range(first, last, batchSize):
+                stop = min(start + batchSize, last)
+                values = read(cycles[start:stop].tolist())
+                if start == first:
+                    if stop - start > 1:
+                        write(cycles[start+1:stop].tolist(), values[:-1])
+                else:
+                    write(cycles[start:stop].tolist(), [carry] + values[:-1])
+                carry = values[-1]
+            write([cycles[first]], [carry])
+        flush()
+
+    def applyMany(self, arrs: Sequence[List[Any]], batchSize: int = 4096) -> None:
+        """Permute several equal-length arrays in one walk over the cycles."""
+        def read(indices: List[int]) -> List[Any]:
+            return list(zip(*(list(map(arr.__getitem__, indices)) for arr in arrs)))
+        def write(indices: List[int], rows: List[Any]) -> None:
+            for arr, column in zip(arrs, zip(*rows)):
+                for i, value in zip(indices, column):
+                    arr[i] = value
+        self.applyBatched(read, write, batchSize)
+
+    def restrict(self, start: int, stop: int) -> 'Permutation':
+        """Keep only cycles that meet [start, stop); the rest become fixed."""
+        r = list(range(len(self.p)))
+        offsets = self._offsets
+        for c in range(len(offsets)-1):
+            cycle = self._cycles[offsets[c]:offsets[c+1]]
+            if any(start <= i < stop for i in cycle):
+                for i in cycle:
+                    r[i] = self.p[i]
+        return Permutation(r)
+
+    def compose(self, other: 'Permutation') -> 'Permutation':
+        """Permutation that applies self, then other."""
+        q = other.p
+        return Permutation([q[j] for j in self.p])
+
+    def _inverseList(self) -> Perm:
+        pInv = list(range(len(self.p)))
+        p = self.p
+        for i in self._cycles:
+            pInv[p[i]] = i
+        return pInv
+
+    def inverse(self) -> 'Permutation':
+        return Permutation(self._inverseList())
+
+    def pow(self, k: int) -> 'Permutation':
+        """Apply k times (k may be negative), in O(n) via the cycles."""
+        r = list(range(len(self.p)))
+        cycles = self._cycles
+        offsets = self._offsets
+        for c in range(len(offsets)-1):
+            first, last = offsets[c], offsets[c+1]
+            cycle = cycles[first:last]
+            shift = k % len(cycle)
+            for i, j in zip(cycle, cycle[shift:] + cycle[:shift]):
+                r[i] = j
+        return Permutation(r)
+
+    def order(self) -> int:
+        offsets = self._offsets
+        return lcm(*(offsets[c+1] - offsets[c] for c in range(len(offsets)-1)))
+
+    def parity(self) -> int:
+        """0 if even, 1 if odd. A cycle of length m is m-1 transpositions."""
+        return (len(self._cycles) - (len(self._offsets)-1)) % 2
 
 def invertPerm(p: Perm) -> None:
-    n = len(p)
-    for i in range(n):
-        if p[i] < 0:
-            continue
-        prev = i
-        curr = p[prev]
-        next = p[curr]
-        while True:
-            p[curr] = prev-n
-            if curr == i:
-                break
-            prev, curr, next = curr, next, p[next]
-    for i in range(n):
-        p[i] += n
+    p[:] = Permutation(p)._inverseList()
 
 def invertPermSimple(p: Perm) -> Perm:
     pInv = [0]*len(p)
@@ -30,35 +203,90 @@ def permute(p: Perm, **kwargs) -> None:
     n = len(p)
     i: int = kwargs['start'] if 'start' in kwargs else 0
     j: int = kwargs['stop'] if 'stop' in kwargs else n
-    read: Callable[[int], Any]
-    write: Callable[[int, Any], None]
+    perm = Permutation(p)
+    if i > 0 or j < n:
+        perm = perm.restrict(i, j)
     if 'read' in kwargs and 'write' in kwargs:
-        read = kwargs['read']
-        write = kwargs['write']
+        perm.applyWith(kwargs['read'], kwargs['write'])
+    elif 'readBatch' in kwargs and 'writeBatch' in kwargs:
+        perm.applyBatched(kwargs['readBatch'], kwargs['writeBatch'])
+    elif 'arrs' in kwargs:
+        perm.applyMany(kwargs['arrs'])
     elif 'arr' in kwargs:
-        arr: List[Any] = kwargs['arr']
-        read = arr.__getitem__
-        write = arr.__setitem__
+        perm.apply(kwargs['arr'])
     else:
         raise ValueError('Expected "read" and "write" in kwargs.')
 
-    for k in range(i, j):
-        if p[k] < 0:
-            continue
-        prev = k
-        curr = p[prev]
-        prevValue = read(prev)
-        while p[curr] >= 0:
-            temp = read(curr)
-            write(curr, prevValue)
-            prevValue = temp
-            prev, curr = curr, p[curr]
-            p[prev] -= n
-        write(curr, prevValue)
-    for k in range(i, j):
-        p[k] += n
+def _sortedOrder(indices: List[int]) -> List[int]:
+    return sorted(range(len(indices)), key=indices.__getitem__)
+
+def permuteFile(
+    p: Perm,
+    path: str,
+    recordSize: int,
+    *,
+    outPath: Optional[str] = None,
+    batchSize: int = 1 << 16,
+) -> None:
+    """permute(p, ...) over the fixed-size records of a file.
+
+    With outPath, output is written front to back one batch of records at a
+    time, each gathered from the memory-mapped input in ascending offset
+    order. Without it, the file is permuted in place through applyBatched
+    on a writable map, again touching each batch in offset order. Memory
+    is O(n) for p plus O(batchSize * recordSize) for records.
+
+    An outPath naming the input file itself also permutes in place;
+    opening it for writing would truncate the input.
+    """
+    n = len(p)
+    if os.path.getsize(path) != n * recordSize:
+        raise ValueError('File size does not match len(p) * recordSize.')
+    if outPath is not None and os.path.exists(outPath) and os.path.samefile(path, outPath):
+        outPath = None
+    perm = Permutation(p)
+    if outPath is not None:
+        with open(path, 'rb') as f, open(outPath, 'wb') as out:
+            if n == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                gather = perm._inverseList()
+                for start in range(0, n, batchSize):
+                    sources = gather[start:start+batchSize]
+                    buf = bytearray(len(sources) * recordSize)
+                    for k in _sortedOrder(sources):
+                        offset = sources[k] * recordSize
+                        buf[k*recordSize:(k+1)*recordSize] = mm[offset:offset+recordSize]
+                    out.write(buf)
+        return
+    if n == 0:
+        return
+    with open(path, 'r+b') as f, mmap.mmap(f.fileno(), 0) as mm:
+        def read(indices: List[int]) -> List[Any]:
+            values: List[Any] = [None]*len(indices)
+            for k in _sortedOrder(indices):
+                offset = indices[k] * recordSize
+                values[k] = mm[offset:offset+recordSize]
+            return values
+        def write(indices: List[int], values: List[Any]) -> None:
+            for k in _sortedOrder(indices):
+                offset = indices[k] * recordSize
+                mm[offset:offset+recordSize] = values[k]
+        perm.applyBatched(read, write, batchSize)
+        mm.flush()
 
 def _runTest() -> None:
+    import tempfile
+    for bad in ([-1, 0], [2, 0], [1, 1], [0, 2, 2]):
+        try:
+            Permutation(bad)
+            assert False, bad
+        except ValueError:
+            pass
+    # Items past len(p) are left alone.
+    arr = list('abcd')
+    permute([1, 0], arr=arr)
+    assert arr == ['b', 'a', 'c', 'd']
     for n in range(20):
         p = list(range(n))
         shuffle(p)
@@ -72,6 +300,69 @@ def _runTest() -> None:
             print('P^-1:', pInv)
             print('arr :', arr)
             return
+        perm = Permutation(p)
+        arr = list(range(n))
+        perm.apply(arr)
+        expected = [0]*n
+        for k in range(n):
+            expected[p[k]] = k
+        if arr != expected:
+            print('Apply:', p, arr)
+            return
+        q = list(range(n))
+        shuffle(q)
+        arr = list(range(n))
+        permute(p, arr=arr)
+        permute(q, arr=arr)
+        composed = list(range(n))
+        perm.compose(Permutation(q)).apply(composed)
+        if arr != composed:
+            print('Compose:', p, q)
+            return
+        pBefore = list(p)
+        keys, values = list(range(n)), [str(k) for k in range(n)]
+        for batchSize in (1, 2, 3, 4096):
+            cols = [list(keys), list(values)]
+            perm.applyMany(cols, batchSize)
+            if cols != [expected, [str(k) for k in expected]] or p != pBefore:
+                print('Apply many:', p, batchSize)
+                return
+        records = [bytes([k % 256, k // 256, 7]) for k in range(n)]
+        permuted = list(records)
+        permute(p, arr=permuted)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'records')
+            outPath = os.path.join(tmp, 'out')
+            for batchSize in (1, 3, 4096):
+                with open(path, 'wb') as f:
+                    f.write(b''.join(records))
+                permuteFile(p, path, 3, outPath=outPath, batchSize=batchSize)
+                permuteFile(p, path, 3, batchSize=batchSize)
+                sameOut = os.path.join(tmp, '.', 'records2')
+                with open(sameOut, 'wb') as f:
+                    f.write(b''.join(records))
+                permuteFile(p, sameOut, 3, outPath=os.path.join(tmp, 'records2'), batchSize=batchSize)
+                with open(sameOut, 'rb') as f:
+                    if f.read() != b''.join(permuted):
+                        print('Same file:', p, batchSize)
+                        return
+                for name in (path, outPath):
+                    with open(name, 'rb') as f:
+                        if f.read() != b''.join(permuted):
+                            print('File:', p, name, batchSize)
+                            return
+        iden = Permutation(list(range(n)))
+        order = perm.order()
+        if perm.pow(order) != iden or perm.pow(-1) != perm.inverse():
+            print('Order:', p, order)
+            return
+        if perm.pow(5) != perm.compose(perm).compose(perm).compose(perm).compose(perm):
+            print('Pow:', p)
+            return
+        inversions = sum(p[a] > p[b] for a in range(n) for b in range(a+1, n))
+        if perm.parity() != inversions % 2:
+            print('Parity:', p)
+            return
     print('Nice!')
 
 if __name__ == '__main__':
@@ -0,0 +1,361 @@
+"""Persistent Red-Black Tree.
+
+Nodes are never mutated once built. Every update path-copies the O(log n)
+nodes it touches and shares the rest, so any earlier root stays a valid,
+readable version.
+
+Updates are join-based: split at the key, then join the halves back.
+Roots may be red; join blackens them before use.
+"""
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+@dataclass(slots=True, eq=False)
+class PNode[KT, VT]:
+  key: KT
+  value: VT
+  left: Optional['PNode[KT, VT]']
+  right: Optional['PNode[KT, VT]']
+  red: bool
+  # Black nodes on any path down to a leaf, counting this one.
+  bh: int
+  size: int
+
+def _bh(node: Optional[PNode]) -> int:
+  return 0 if node is None else node.bh
+
+def _size(node: Optional[PNode]) -> int:
+  return 0 if node is None else node.size
+
+def _isRed(node: Optional[PNode]) -> bool:
+  return node is not None and node.red
+
+def _mk[KT, VT](
+  red: bool,
+  left: Optional[PNode[KT, VT]],
+  key: KT,
+  value: VT,
+  right: Optional[PNode[KT, VT]],
+) -> PNode[KT, VT]:
+  bh = _bh(left) + (not red)
+  return PNode(key, value, left, right, red, bh, 1 + _size(left) + _size(right))
+
+def _blacken[KT, VT](node: Optional[PNode[KT, VT]]) -> Optional[PNode[KT, VT]]:
+  if not _isRed(node):
+    return node
+  return _mk(False, node.left, node.key, node.value, node.right)
+
+def _joinRight[KT, VT](
+  left: Optional[PNode[KT, VT]],
+  key: KT,
+  value: VT,
+  right: Optional[PNode[KT, VT]],
+) -> PNode[KT, VT]:
+  """Hang right under the right spine of the taller left tree.
+
+  A red-red pair made below a black node is rotated away there. One left at
+  the top is for the caller.
+  """
+  if not _isRed(left) and _bh(left) == _bh(right):
+    return _mk(True, left, key, value, right)
+  child = _joinRight(left.right, key, value, right)
+  if not left.red and child.red and _isRed(child.right):
+    # Rotate left and blacken the outer grandchild.
+    newLeft = _mk(False, left.left, left.key, left.value, child.left)
+    newRight = _blacken(child.right)
+    return _mk(True, newLeft, child.key, child.value, newRight)
+  return _mk(left.red, left.left, left.key, left.value, child)
+
+def _joinLeft[KT, VT](
+  left: Optional[PNode[KT, VT]],
+  key: KT,
+  value: VT,
+  right: Optional[PNode[KT, VT]],
+) -> PNode[KT, VT]:
+  if not _isRed(right) and _bh(right) == _bh(left):
+    return _mk(True, left, key, value, right)
+  child = _joinLeft(left, key, value, right.left)
+  if not right.red and child.red and _isRed(child.left):
+    newLeft = _blacken(child.left)
+    newRight = _mk(False, child.right, right.key, right.value, right.right)
+    return _mk(True, newLeft, child.key, child.value, newRight)
+  return _mk(right.red, child, right.key, right.value, right.right)
+
+def _join[KT, VT](
+  left: Optional[PNode[KT, VT]],
+  key: KT,
+  value: VT,
+  right: Optional[PNode[KT, VT]],
+) -> PNode[KT, VT]:
+  """Join left, (key, value) and right, with left < key < right."""
+  left = _blacken(left)
+  right = _blacken(right)
+  if _bh(left) > _bh(right):
+    node = _joinRight(left, key, value, right)
+    if node.red and _isRed(node.right):
+      node = _blacken(node)
+    return node
+  if _bh(right) > _bh(left):
+    node = _joinLeft(left, key, value, right)
+    if node.red and _isRed(node.left):
+      node = _blacken(node)
+    return node
+  return _mk(True, left, key, value, right)
+
+def _split[KT, VT](
+  node: Optional[PNode[KT, VT]],
+  key: KT,
+) -> Tuple[Optional[PNode[KT, VT]], Optional[PNode[KT, VT]], Optional[PNode[KT, VT]]]:
+  """Split into keys below key, the node at key (if any), and keys above."""
+  if node is None:
+    return None, None, None
+  if key < node.key:
+    lower, found, upper = _split(node.left, key)
+    return lower, found, _join(upper, node.key, node.value, node.right)
+  if node.key < key:
+    lower, found, upper = _split(node.right, key)
+    return _join(node.left, node.key, node.value, lower), found, upper
+  return node.left, node, node.right
+
+def _splitLast[KT, VT](node: PNode[KT, VT]) -> Tuple[Optional[PNode[KT, VT]], PNode[KT, VT]]:
+  if node.right is None:
+    return node.left, node
+  rest, last = _splitLast(node.right)
+  return _join(node.left, node.key, node.value, rest), last
+
+def _replace[KT, VT](node: PNode[KT, VT], key: KT, value: VT) -> PNode[KT, VT]:
+  """Copy the path down to an existing key with a new value. No rebalancing."""
+  if key < node.key:
+    return _mk(node.red, _replace(node.left, key, value), node.key, node.value, node.right)
+  if node.key < key:
+    return _mk(node.red, node.left, node.key, node.value, _replace(node.right, key, value))
+  return _mk(node.red, node.left, key, value, node.right)
+
+def _join2[KT, VT](
+  left: Optional[PNode[KT, VT]],
+  right: Optional[PNode[KT, VT]],
+) -> Optional[PNode[KT, VT]]:
+  if left is None:
+    return right
+  rest, last = _splitLast(left)
+  return _join(rest, last.key, last.value, right)
+
+class PRBTree[KT, VT](MutableMapping[KT, VT]):
+  """Persistent map with unique keys.
+
+  Writes swap in a new root; nothing reachable from an old root changes.
+  Readers take snapshot() in O(1) and keep a consistent view while the
+  writer goes on.
+  """
+
+  __slots__ = ('root',)
+
+  def __init__(self, root: Optional[PNode[KT, VT]] = None) -> None:
+    self.root = root
+
+  def __len__(self) -> int:
+    return _size(self.root)
+
+  def snapshot(self) -> 'PRBTree[KT, VT]':
+    return PRBTree(self.root)
+
+  def find(self, key: KT) -> Optional[PNode[KT, VT]]:
+    node = self.root
+    while node is not None:
+      if key < node.key:
+        node = node.left
+      elif node.key < key:
+        node = node.right
+      else:
+        return node
+    return None
+
+  def get(self, key: KT, default: Optional[VT] = None) -> Optional[VT]:
+    node = self.find(key)
+    return default if node is None else node.value
+
+  def __contains__(self, key: object) -> bool:
+    return self.find(key) is not None
+
+  def __getitem__(self, key: KT) -> VT:
+    node = self.find(key)
+    if node is None:
+      raise KeyError(key)
+    return node.value
+
+  def __setitem__(self, key: KT, value: VT) -> None:
+    if self.find(key) is not None:
+      self.root = _replace(self.root, key, value)
+      return
+    lower, _, upper = _split(self.root, key)
+    self.root = _join(lower, key, value, upper)
+
+  def __delitem__(self, key: KT) -> None:
+    lower, found, upper = _split(self.root, key)
+    if found is None:
+      raise KeyError(key)
+    self.root = _join2(lower, upper)
+
+  def __iter__(self) -> Iterator[KT]:
+    for node in self._iterNodes():
+      yield node.key
+
+  def clear(self) -> None:
+    self.root = None
+
+  def _iterNodes(self) -> Iterator[PNode[KT, VT]]:
+    node = self.root
+    stack = []
+    while node or stack:
+      while node:
+        stack.append(node)
+        node = node.left
+      node = stack.pop()
+      yield node
+      node = node.right
+
+  def iterRange(self, k1: KT, k2: KT, reverse: bool = False) -> Iterator[PNode[KT, VT]]:
+    """Lazily yield nodes with keys in [k1, k2], with an O(log n) stack.
+
+    Iterates the version current at the call, whatever is written later.
+    """
+    node = self.root
+    stack = []
+    while node or stack:
+      while node:
+        stack.append(node)
+        if reverse:
+          node = None if k2 < node.key else node.right
+        else:
+          node = None if node.key < k1 else node.left
+      node = stack.pop()
+      if reverse:
+        if node.key < k1:
+          return
+        if not k2 < node.key:
+          yield node
+        node = node.left
+      else:
+        if k2 < node.key:
+          return
+        if not node.key < k1:
+          yield node
+        node = node.right
+
+  def searchRange(self, k1: KT, k2: KT) -> List[PNode[KT, VT]]:
+    return list(self.iterRange(k1, k2))
+
+  def floor(self, key: KT) -> Optional[PNode[KT, VT]]:
+    found = None
+    node = self.root
+    while node is not None:
+      if key < node.key:
+        node = node.left
+      else:
+        found = node
+        node = node.right
+    return found
+
+  def ceiling(self, key: KT) -> Optional[PNode[KT, VT]]:
+    found = None
+    node = self.root
+    while node is not None:
+      if node.key < key:
+        node = node.right
+      else:
+        found = node
+        node = node.left
+    return found
+
+  def min(self) -> Optional[PNode[KT, VT]]:
+    node = self.root
+    while node is not None and node.left is not None:
+      node = node.left
+    return node
+
+  def max(self) -> Optional[PNode[KT, VT]]:
+    node = self.root
+    while node is not None and node.right is not None:
+      node = node.right
+    return node
+
+  def select(self, k: int) -> PNode[KT, VT]:
+    """Return the node with the k-th smallest key (0-indexed)."""
+    if not 0 <= k < len(self):
+      raise IndexError(f'Rank {k} out of range.')
+    node = self.root
+    while True:
+      leftSize = _size(node.left)
+      if k < leftSize:
+        node = node.left
+      elif k > leftSize:
+        k -= leftSize + 1
+        node = node.right
+      else:
+        return node
+
+  def rank(self, key: KT) -> int:
+    """Count keys strictly less than key."""
+    rank = 0
+    node = self.root
+    while node is not None:
+      if node.key < key:
+        rank += _size(node.left) + 1
+        node = node.right
+      else:
+        node = node.left
+    return rank
+
+def _checkTree(node: Optional[PNode]) -> int:
+  """Check the red-black invariants and cached fields; return black height."""
+  if node is None:
+    return 0
+  for child in (node.left, node.right):
+    assert not (node.red and _isRed(child))
+  if node.left is not None:
+    assert node.left.key < node.key
+  if node.right is not None:
+    assert node.key < node.right.key
+  bh = _checkTree(node.left)
+  assert bh == _checkTree(node.right)
+  assert node.bh == bh + (not node.red)
+  assert node.size == 1 + _size(node.left) + _size(node.right)
+  return node.bh
+
+def _runTest() -> None:
+  import random
+  t = PRBTree()
+  model = {}
+  versions = []
+  for i in range(4000):
+    x = random.randrange(500)
+    if random.random() < 0.6:
+      t[x] = i
+      model[x] = i
+    elif x in model:
+      del t[x]
+      del model[x]
+    if i % 100 == 0:
+      versions.append((t.snapshot(), sorted(model.items())))
+  _checkTree(t.root)
+  assert list(t.items()) == sorted(model.items())
+  for snapshot, items in versions:
+    _checkTree(snapshot.root)
+    assert [(node.key, node.value) for node in snapshot._iterNodes()] == items
+  keys = sorted(model)
+  assert [t.select(i).key for i in range(len(keys))] == keys
+  assert all(t.rank(k) == i for i, k in enumerate(keys))
+  assert [n.key for n in t.iterRange(100, 200)] == [k for k in keys if 100 <= k <= 200]
+  assert [n.key for n in t.iterRange(100, 200, reverse=True)] == [k for k in keys if 100 <= k <= 200][::-1]
+  assert t.min().key == keys[0] and t.max().key == keys[-1]
+  assert t.floor(keys[3] + 0.5).key == keys[3] and t.ceiling(keys[3] + 0.5).key == keys[4]
+  try:
+    del t[-1]
+    assert False
+  except KeyError:
+    pass
+  print('Nice!')
+
+if __name__ == '__main__':
+  _runTest()
@@ -1,7 +1,22 @@
 import operator as op
-from math import ceil, floor
-from random import randrange
-from typing import List, Optional
+import pickle
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import accumulate, repeat
+from math import ceil, floor, sqrt
+from random import randrange, shuffle
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+from rbtree import OSTree
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 def getRank[T](arr: List[T], elem: T, *, left: bool = True) -> int:
     rank = 0
@@ -15,6 +30,27 @@ def getPercentile[T](arr: List[T], elem: T, *, left: bool = True) -> float:
     rank = getRank(arr, elem, left=left)
     return rank / len(arr)
 
+def getRanks[T](arr: List[T], elems: List[T], *, left: bool = True) -> List[int]:
+    """getRank for many elements against one array.
+
+    Sorts arr once and binary searches each element: vectorized through
+    NumPy for numeric data when it is installed, bisect otherwise.
+    """
+    if np is not None:
+        ref = np.asarray(arr)
+        queries = np.asarray(elems)
+        if ref.dtype.kind in 'biuf' and queries.dtype.kind in 'biuf':
+            ref = np.sort(ref)
+            side = 'left' if left else 'right'
+            return np.searchsorted(ref, queries, side=side).tolist()
+    ref = sorted(arr)
+    search = bisect_left if left else bisect_right
+    return [search(ref, elem) for elem in elems]
+
+def getPercentiles[T](arr: List[T], elems: List[T], *, left: bool = True) -> List[float]:
+    n = len(arr)
+    return [rank / n for rank in getRanks(arr, elems, left=left)]
+
 def _swap[T](arr: List[T], i: int, j: int) -> None:
     arr[i], arr[j] = arr[j], arr[i]
 
@@ -72,8 +108,97 @@ def _select[T](
             right = pivotIndex
     return pivotIndex
 
+def _partition3[T](arr: List[T], left: int, right: int, pivotIndex: int) -> Tuple[int, int]:
+    """Three-way (fat) partition, so runs of equal elements cost one pass."""
+    pivot = arr[pivotIndex]
+    lt, i, gt = left, left, right
+    while i < gt:
+        x = arr[i]
+        if x < pivot:
+            _swap(arr, lt, i)
+            lt += 1
+            i += 1
+        elif pivot < x:
+            gt -= 1
+            _swap(arr, i, gt)
+        else:
+            i += 1
+    # Less:  [left, lt)
+    # Equal: [lt, gt)
+    # More:  [gt, right)
+    return lt, gt
+
+def _median3[T](arr: List[T], i: int, j: int, k: int) -> int:
+    a, b, c = arr[i], arr[j], arr[k]
+    if a < b:
+        return j if b < c else (k if a < c else i)
+    return i if a < c else (k if b < c else j)
+
+def _momPivot[T](arr: List[T], left: int, right: int) -> int:
+    """Median of medians of five, each group sorted in place."""
+    if right - left <= 5:
+        arr[left:right] = sorted(arr[left:right])
+        return (left+right) // 2
+    i = left
+    for gLeft in range(left, right, 5):
+        gRight = min(gLeft + 5, right)
+        arr[gLeft:gRight] = sorted(arr[gLeft:gRight])
+        _swap(arr, (gLeft+gRight) // 2, i)
+        i += 1
+    return _introSelect(arr, (left+i) // 2, left=left, right=i, strikes=_MAX_STRIKES)
+
+def _choosePivot[T](arr: List[T], left: int, right: int, *, mom: bool) -> int:
+    if mom:
+        return _momPivot(arr, left, right)
+    n = right - left
+    if n < 64:
+        return randrange(left, right)
+    # Ninther of random samples.
+    s = [randrange(left, right) for _ in range(9)]
+    return _median3(
+        arr,
+        _median3(arr, s[0], s[1], s[2]),
+        _median3(arr, s[3], s[4], s[5]),
+        _median3(arr, s[6], s[7], s[8]))
+
+# Cheap pivots are used until this many bad splits; then median of medians
+# takes over, which bounds the worst case at linear.
+_MAX_STRIKES = 2
+
+def _isBadSplit(left: int, right: int, newLeft: int, newRight: int) -> bool:
+    return 4*(newRight - newLeft) > 3*(right - left)
+
+def _introSelect[T](
+    arr: List[T],
+    rank: int,
+    *,
+    left: int = 0,
+    right: Optional[int] = None,
+    strikes: int = 0,
+) -> int:
+    """Selection with fat partitions and cheap pivots.
+
+    A partition that keeps more than 3/4 of the segment is a strike.
+    """
+    right = len(arr) if right is None else right
+    while right - left > 1:
+        pivotIndex = _choosePivot(arr, left, right, mom=strikes >= _MAX_STRIKES)
+        lt, gt = _partition3(arr, left, right, pivotIndex)
+        if rank < lt:
+            newLeft, newRight = left, lt
+        elif rank >= gt:
+            newLeft, newRight = gt, right
+        else:
+            return rank
+        strikes += _isBadSplit(left, right, newLeft, newRight)
+        left, right = newLeft, newRight
+    return rank
+
 def getElemAtRank[T](arr: List[T], rank: int) -> T:
-    pivotIndex = _select(arr, rank, mom=True)
+    # Ranks past the end give the max, as they always have; percentile 1.0
+    # lands on len(arr).
+    rank = min(rank, len(arr) - 1)
+    pivotIndex = _introSelect(arr, rank)
     return arr[pivotIndex]
 
 def getElemAtPercentile[T](arr: List[T], percentile: float) -> T:
@@ -81,3 +206,535 @@ def getElemAtPercentile[T](arr: List[T], percentile: float) -> T:
     # Floor is used here but ceil can also work.
     rank = floor(rankF)
     return getElemAtRank(arr, rank)
+
+def _multiSelect[T](arr: List[T], ranks: List[int]) -> None:
+    """Move the element of each rank in ranks to its index in arr.
+
+    One partition serves every requested rank in the segment, and only
+    segments still holding requested ranks are recursed into. Pivots and
+    the fallback to median of medians follow _introSelect, per segment.
+    """
+    ranks = sorted(set(ranks))
+    stack = [(0, len(arr), 0, len(ranks), 0)]
+    while stack:
+        left, right, lo, hi, strikes = stack.pop()
+        if lo == hi or right - left <= 1:
+            continue
+        if hi - lo == 1:
+            _introSelect(arr, ranks[lo], left=left, right=right, strikes=strikes)
+            continue
+        pivotIndex = _choosePivot(arr, left, right, mom=strikes >= _MAX_STRIKES)
+        lt, gt = _partition3(arr, left, right, pivotIndex)
+        mid = bisect_left(ranks, lt, lo, hi)
+        midRight = bisect_left(ranks, gt, mid, hi)
+        for segLeft, segRight, segLo, segHi in ((left, lt, lo, mid), (gt, right, midRight, hi)):
+            bad = _isBadSplit(left, right, segLeft, segRight)
+            stack.append((segLeft, segRight, segLo, segHi, strikes + bad))
+
+def getElemsAtRanks[T](arr: List[T], ranks: List[int]) -> List[T]:
+    for rank in ranks:
+        if not 0 <= rank < len(arr):
+            raise IndexError(f'Rank {rank} out of range.')
+    _multiSelect(arr, ranks)
+    return [arr[rank] for rank in ranks]
+
+def getElemsAtPercentiles[T](arr: List[T], percentiles: List[float]) -> List[T]:
+    # Clamped like getElemAtRank, so percentile 1.0 gives the max.
+    last = len(arr) - 1
+    ranks = [min(floor(percentile * len(arr)), last) for percentile in percentiles]
+    return getElemsAtRanks(arr, ranks)
+
+def _littleEndian(arr: array) -> bytes:
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr.tobytes()
+
+def _fromLittleEndian(code: str, data: bytes) -> array:
+    arr = array(code, data)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+class QuantileSketch[T]:
+    """Mergeable streaming quantile summary (KLL sketch).
+
+    Approximate counterpart of getRank and getElemAtPercentile for streams
+    too large to hold. Items sit in compactors; one at level h stands for
+    2^h inputs. A full compactor is sorted and every other item, from a
+    random offset, moves up a level. Capacities shrink geometrically below
+    the top, so memory is O(k) and the rank error is O(n/k).
+    """
+
+    _MAGIC = b'KLL1'
+    _HEADER = struct.Struct('<4sIQIc')
+
+    def __init__(self, k: int = 200) -> None:
+        if k < 2:
+            raise ValueError('Expected k >= 2.')
+        self.k = k
+        self.n = 0
+        self.compactors: List[List[T]] = [[]]
+        self._size = 0
+        self._maxSize = self._capacity(0)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return ceil(self.k * (2/3)**depth) + 1
+
+    def _grow(self) -> None:
+        self.compactors.append([])
+        self._maxSize = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _compress(self) -> None:
+        for h, compactor in enumerate(self.compactors):
+            if len(compactor) < self._capacity(h):
+                continue
+            if h+1 == len(self.compactors):
+                self._grow()
+            compactor.sort()
+            last = compactor.pop() if len(compactor) % 2 else None
+            self.compactors[h+1].extend(compactor[randrange(2)::2])
+            compactor.clear()
+            if last is not None:
+                compactor.append(last)
+            self._size = sum(len(c) for c in self.compactors)
+            if self._size < self._maxSize:
+                return
+
+    def add(self, item: T) -> None:
+        self.compactors[0].append(item)
+        self.n += 1
+        self._size += 1
+        if self._size >= self._maxSize:
+            self._compress()
+
+    def addMany(self, items: Iterable[T]) -> None:
+        for item in items:
+            self.add(item)
+
+    def merge(self, other: 'QuantileSketch[T]') -> None:
+        """Fold other into this sketch. Other is left unchanged."""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for compactor, otherCompactor in zip(self.compactors, other.compactors):
+            compactor.extend(otherCompactor)
+        self.n += other.n
+        self._size = sum(len(c) for c in self.compactors)
+        while self._size >= self._maxSize:
+            self._compress()
+
+    def _weighted(self) -> Tuple[List[T], List[int]]:
+        pairs = sorted(
+            (item, 1 << h)
+            for h, compactor in enumerate(self.compactors)
+            for item in compactor)
+        return [item for item, _ in pairs], list(accumulate(w for _, w in pairs))
+
+    def rank(self, elem: T, *, left: bool = True) -> int:
+        """Approximate getRank over everything added."""
+        cmp = op.lt if left else op.le
+        return sum(
+            (1 << h) * sum(1 for x in compactor if cmp(x, elem))
+            for h, compactor in enumerate(self.compactors))
+
+    def percentile(self, elem: T, *, left: bool = True) -> float:
+        return self.rank(elem, left=left) / self.n
+
+    def quantile(self, percentile: float) -> T:
+        """Approximate getElemAtPercentile over everything added."""
+        if self.n == 0:
+            raise IndexError('Empty sketch.')
+        items, cumWeights = self._weighted()
+        rank = floor(percentile * cumWeights[-1])
+        i = bisect_left(cumWeights, rank + 1)
+        return items[min(i, len(items)-1)]
+
+    def toBytes(self) -> bytes:
+        """Serialize for shipping between processes and hosts.
+
+        Int and float items are packed as raw arrays; anything else is
+        pickled. Everything is little-endian, whatever the host.
+        """
+        items = [item for compactor in self.compactors for item in compactor]
+        if all(type(x) is float for x in items):
+            code, data = b'd', _littleEndian(array('d', items))
+        elif all(type(x) is int and -2**63 <= x < 2**63 for x in items):
+            code, data = b'q', _littleEndian(array('q', items))
+        else:
+            code, data = b'p', pickle.dumps(items, protocol=pickle.HIGHEST_PROTOCOL)
+        header = self._HEADER.pack(self._MAGIC, self.k, self.n, len(self.compactors), code)
+        sizes = _littleEndian(array('I', [len(c) for c in self.compactors]))
+        return header + sizes + data
+
+    @classmethod
+    def fromBytes(cls, data: bytes) -> 'QuantileSketch':
+        magic, k, n, levels, code = cls._HEADER.unpack_from(data)
+        if magic != cls._MAGIC:
+            raise ValueError('Not a serialized QuantileSketch.')
+        offset = cls._HEADER.size
+        sizes = _fromLittleEndian('I', data[offset:offset + 4*levels])
+        offset += 4*levels
+        if code == b'p':
+            items = pickle.loads(data[offset:])
+        else:
+            items = _fromLittleEndian(code.decode(), data[offset:]).tolist()
+        sketch = cls(k)
+        sketch.n = n
+        sketch.compactors = []
+        for size in sizes:
+            sketch.compactors.append(items[:size])
+            items = items[size:]
+        sketch._size = sum(sizes)
+        sketch._maxSize = sum(sketch._capacity(h) for h in range(levels))
+        return sketch
+
+@dataclass(frozen=True)
+class FileShard:
+    """Shard stored as a text file with one value per line.
+
+    parse must be picklable, e.g. a builtin like int or float.
+    """
+    path: str
+    parse: Callable[[str], Any] = float
+
+    def __iter__(self) -> Iterator[Any]:
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    yield self.parse(line)
+
+def _inWindow[T](x: T, lo: Optional[T], hi: Optional[T]) -> bool:
+    return (lo is None or lo < x) and (hi is None or x < hi)
+
+def _shardRound[T](
+    shard: Iterable[T],
+    lo: Optional[T],
+    hi: Optional[T],
+    pivots: List[T],
+    sampleSize: int,
+) -> Tuple[int, List[int], List[int], List[T]]:
+    """One scan of a shard restricted to the open window (lo, hi).
+
+    Returns the window count, per pivot the count of values first less than
+    it (cumulative sums give getRank) and equal to it, and a uniform sample
+    in random order, so any prefix of it is a uniform subsample too.
+    """
+    count = 0
+    lessStarts = [0]*(len(pivots)+1)
+    equals = [0]*len(pivots)
+    sample = []
+    for x in shard:
+        if not _inWindow(x, lo, hi):
+            continue
+        count += 1
+        i = bisect_left(pivots, x)
+        if i < len(pivots) and not x < pivots[i]:
+            equals[i] += 1
+            i += 1
+        lessStarts[i] += 1
+        # Reservoir sampling.
+        if len(sample) < sampleSize:
+            sample.append(x)
+        else:
+            j = randrange(count)
+            if j < sampleSize:
+                sample[j] = x
+    # Reservoir slots are not in random order: early items fill the front.
+    shuffle(sample)
+    return count, lessStarts, equals, sample
+
+def _shardFetch[T](shard: Iterable[T], lo: Optional[T], hi: Optional[T]) -> List[T]:
+    return [x for x in shard if _inWindow(x, lo, hi)]
+
+def _choosePivots[T](sample: List[T], fraction: float) -> List[T]:
+    """Evenly spaced sample quantiles plus a tight pair around the target."""
+    sample = sorted(sample)
+    n = len(sample)
+    if n == 0:
+        return []
+    margin = 2 / sqrt(n)
+    fractions = [i / 32 for i in range(1, 32)] + [fraction - margin, fraction + margin]
+    picks = {sample[min(n-1, max(0, floor(f * n)))] for f in fractions}
+    return sorted(picks)
+
+def _selectDistributed[T](
+    shards: List[Iterable[T]],
+    executor: Executor,
+    rankOf: Callable[[int], int],
+    sampleSize: int,
+    fetchLimit: int,
+    maxRounds: int = 32,
+) -> T:
+    lo = hi = None
+    below = 0
+    rank = None
+    pivots = []
+    for _ in range(maxRounds):
+        results = list(executor.map(
+            _shardRound, shards, repeat(lo), repeat(hi), repeat(pivots), repeat(sampleSize)))
+        count = sum(r[0] for r in results)
+        if rank is None:
+            rank = rankOf(count)
+            if not 0 <= rank < count:
+                raise IndexError(f'Rank {rank} out of range.')
+        lessStarts = [sum(col) for col in zip(*(r[1] for r in results))]
+        equals = [sum(col) for col in zip(*(r[2] for r in results))]
+        # Walk the pivots in order to find the narrowest window around rank.
+        newLo, newHi, newBelow, newAbove = lo, hi, below, below + count
+        less = below
+        for k, pivot in enumerate(pivots):
+            less += lessStarts[k]
+            if less <= rank < less + equals[k]:
+                return pivot
+            if less + equals[k] <= rank:
+                newLo, newBelow = pivot, less + equals[k]
+            else:
+                newHi, newAbove = pivot, less
+                break
+        # Keep each shard's share of the sample proportional to its count.
+        sample = []
+        for shardCount, _, _, shardSample in results:
+            take = ceil(sampleSize * shardCount / max(count, 1))
+            sample.extend(x for x in shardSample[:take] if _inWindow(x, newLo, newHi))
+        lo, hi, below = newLo, newHi, newBelow
+        if newAbove - newBelow <= fetchLimit:
+            break
+        pivots = _choosePivots(sample, (rank - below) / (newAbove - newBelow))
+    values = [x for part in executor.map(_shardFetch, shards, repeat(lo), repeat(hi)) for x in part]
+    return getElemAtRank(values, rank - below)
+
+def getElemAtRankDistributed[T](
+    shards: List[Iterable[T]],
+    rank: int,
+    *,
+    maxWorkers: Optional[int] = None,
+    sampleSize: int = 1000,
+    fetchLimit: int = 100000,
+) -> T:
+    """Exact getElemAtRank over the union of shards without gathering them.
+
+    Shards must be picklable and iterable more than once: lists, ranges or
+    FileShards. Shards are pickled to the pool every round, so only
+    FileShards (and ranges) avoid shipping the data itself. Each round a process pool scans every shard, counting the
+    values around pivots drawn from the previous round's sample. That
+    narrows a window known to hold the answer. Once at most fetchLimit
+    values remain in it, they are fetched and selected locally.
+    """
+    with ProcessPoolExecutor(maxWorkers) as executor:
+        return _selectDistributed(shards, executor, lambda n: rank, sampleSize, fetchLimit)
+
+def getElemAtPercentileDistributed[T](
+    shards: List[Iterable[T]],
+    percentile: float,
+    *,
+    maxWorkers: Optional[int] = None,
+    sampleSize: int = 1000,
+    fetchLimit: int = 100000,
+) -> T:
+    with ProcessPoolExecutor(maxWorkers) as executor:
+        return _selectDistributed(
+            shards, executor, lambda n: floor(percentile * n), sampleSize, fetchLimit)
+
+class SlidingWindowRank[T]:
+    """Rank and percentile queries over the most recent values.
+
+    Values live in an order-statistic tree, with a FIFO of their nodes for
+    eviction, so push, evict, rank and percentile are all O(log n).
+    Answers match getRank and getElemAtPercentile over the window.
+    """
+
+    def __init__(self, maxSize: Optional[int] = None) -> None:
+        self.maxSize = maxSize
+        self._tree: OSTree[T, None] = OSTree()
+        self._nodes = deque()
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def push(self, elem: T) -> None:
+        """Add elem, evicting the oldest value once past maxSize."""
+        self._nodes.append(self._tree.insert(elem, None))
+        if self.maxSize is not None and len(self._nodes) > self.maxSize:
+            self.evict()
+
+    def evict(self) -> T:
+        """Remove and return the oldest value."""
+        node = self._nodes.popleft()
+        self._tree.removeNode(node)
+        return node.key
+
+    def rank(self, elem: T, *, left: bool = True) -> int:
+        return self._tree.rank(elem, left=left)
+
+    def percentile(self, percentile: float) -> T:
+        # Clamped like getElemAtRank, so percentile 1.0 gives the max.
+        rank = min(floor(percentile * len(self._nodes)), len(self._nodes) - 1)
+        return self._tree.select(rank).key
+
+def _runTest() -> None:
+    for n in range(1, 300, 7):
+        arr = [randrange(n) for _ in range(n)]
+        expected = sorted(arr)
+        ranks = [randrange(n) for _ in range(5)] + [0, n-1]
+        if getElemsAtRanks(list(arr), ranks) != [expected[r] for r in ranks]:
+            print('Ranks:', arr, ranks)
+            return
+        if getElemAtRank(list(arr), n) != expected[-1] or getElemAtPercentile(list(arr), 1.0) != expected[-1]:
+            print('Past the end:', arr)
+            return
+        for rank in ranks:
+            if getElemAtRank(list(arr), rank) != expected[rank]:
+                print('Rank:', arr, rank)
+                return
+            momArr = list(arr)
+            if momArr[_introSelect(momArr, rank, strikes=_MAX_STRIKES)] != expected[rank]:
+                print('Median of medians:', arr, rank)
+                return
+        percentiles = [0.5, 0.9, 0.95, 0.99, 0.999, 1.0]
+        expected = [getElemAtPercentile(list(arr), p) for p in percentiles]
+        if getElemsAtPercentiles(list(arr), percentiles) != expected:
+            print('Percentiles:', arr)
+            return
+        for bad in (-1, n):
+            try:
+                getElemsAtRanks(list(arr), [0, bad])
+                print('Rank out of range:', arr, bad)
+                return
+            except IndexError:
+                pass
+
+    for n in range(1, 100, 9):
+        arr = [randrange(n) for _ in range(n)]
+        elems = [randrange(-1, n+1) for _ in range(20)]
+        for left in (True, False):
+            expected = [getRank(arr, elem, left=left) for elem in elems]
+            if getRanks(arr, elems, left=left) != expected:
+                print('Ranks:', arr, elems, left)
+                return
+            expected = [getPercentile(arr, elem, left=left) for elem in elems]
+            if getPercentiles(arr, elems, left=left) != expected:
+                print('Percentiles:', arr, elems, left)
+                return
+
+    import os
+    import tempfile
+    shards = [[randrange(5000) for _ in range(randrange(1, 20000))] for _ in range(4)]
+    shards.append([42]*30000)
+    arr = [x for shard in shards for x in shard]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'shard.txt')
+        with open(path, 'w') as f:
+            f.write('\n'.join(map(str, shards[0])))
+        fileShards = [FileShard(path, int)] + shards[1:]
+        expected = sorted(arr)
+        for p in (0.0, 0.3, 0.5, 0.99):
+            got = getElemAtPercentileDistributed(fileShards, p, maxWorkers=2, fetchLimit=500)
+            if got != getElemAtPercentile(list(arr), p):
+                print('Distributed:', p, got)
+                return
+        rank = len(arr) - 1
+        if getElemAtRankDistributed(shards, rank, maxWorkers=2, fetchLimit=10) != expected[rank]:
+            print('Distributed rank:', rank)
+            return
+
+    window = SlidingWindowRank(100)
+    arr = [randrange(50) for _ in range(1000)]
+    for i, x in enumerate(arr):
+        window.push(x)
+        recent = arr[max(0, i-99):i+1]
+        if window.percentile(1.0) != max(recent):
+            print('Window max:', i)
+            return
+        if window.percentile(0.99) != getElemAtPercentile(list(recent), 0.99):
+            print('Window percentile:', i)
+            return
+        if window.rank(25) != getRank(recent, 25):
+            print('Window rank:', i)
+            return
+    if window.evict() != arr[-100] or len(window) != 99:
+        print('Window evict')
+        return
+
+    n = 100000
+    arr = [randrange(1000000) for _ in range(n)]
+    sketches = [QuantileSketch(200) for _ in range(4)]
+    for i, sketch in enumerate(sketches):
+        sketch.addMany(arr[i::4])
+    data = sketches[0].toBytes()
+    # Payload is little-endian on every host.
+    header = QuantileSketch._HEADER
+    levels = header.unpack_from(data)[3]
+    first = next(x for c in sketches[0].compactors for x in c)
+    if struct.unpack_from('<q', data, header.size + 4*levels)[0] != first:
+        print('Sketch byte order')
+        return
+    sketch = QuantileSketch.fromBytes(data)
+    for other in sketches[1:]:
+        sketch.merge(QuantileSketch.fromBytes(other.toBytes()))
+    if len(sketch) != n or sum(map(len, sketch.compactors)) > 2000:
+        print('Sketch size:', len(sketch), list(map(len, sketch.compactors)))
+        return
+    for percentile in (0.01, 0.5, 0.9, 0.99):
+        elem = sketch.quantile(percentile)
+        if abs(getPercentile(arr, elem) - percentile) > 0.02:
+            print('Quantile:', percentile, getPercentile(arr, elem))
+            return
+        if abs(sketch.percentile(elem) - getPercentile(arr, elem)) > 0.02:
+            print('Rank:', elem, sketch.percentile(elem), getPercentile(arr, elem))
+            return
+    print('Nice!')
+
+def _runBenchmark() -> None:
+    """Time p50 + p99 selection per input shape and size.
+
+    An engine that takes over a second on a size is skipped for larger
+    sizes of that input; the two-way partition is superlinear on heavy
+    duplicates.
+    """
+    import sys
+    from time import perf_counter
+    def interleaved(n: int) -> List[int]:
+        # Sorted halves interleaved: every fixed-position pivot is extreme.
+        return [i//2 if i % 2 == 0 else n//2 + i//2 for i in range(n)]
+    inputs = {
+        'random': lambda n: [randrange(n) for _ in range(n)],
+        'few distinct': lambda n: [randrange(10) for _ in range(n)],
+        'ms buckets': lambda n: [randrange(200) for _ in range(n)],
+        'all equal': lambda n: [7]*n,
+        'sorted': lambda n: list(range(n)),
+        'organ pipe': lambda n: list(range(n//2)) + list(range(n - n//2, 0, -1)),
+        'interleaved': interleaved,
+    }
+    engines = {
+        'mom two-way': lambda arr, r: arr[_select(arr, r, mom=True)],
+        'introselect': lambda arr, r: arr[_introSelect(arr, r)],
+    }
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    print(f'{"input":>14}{"n":>8}' + ''.join(f'{name:>14}' for name in engines))
+    for name, makeInput in inputs.items():
+        slow = set()
+        for n in (500, 10000, 100000):
+            arr = makeInput(n)
+            line = f'{name:>14}{n:>8}'
+            for engine, select in engines.items():
+                if engine in slow:
+                    line += f'{"-":>14}'
+                    continue
+                start = perf_counter()
+                for p in (0.5, 0.99):
+                    select(list(arr), floor(p * n))
+                elapsed = perf_counter() - start
+                if elapsed > 1.0:
+                    slow.add(engine)
+                line += f'{elapsed:>13.3f}s'
+            print(line)
+
+if __name__ == '__main__':
+    import sys
+    if sys.argv[1:] == ['bench']:
+        _runBenchmark()
+    else:
+        _runTest()
@@ -2,9 +2,17 @@
 
 Be careful with variable reuse after rotation.
 """
-from dataclasses import dataclass
+import mmap
+import pickle
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import ItemsView, Mapping, MutableMapping, ValuesView
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Optional
+from heapq import merge
+from typing import Any, BinaryIO, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 class RBSide(Enum):
   LEFT: bool = False
@@ -12,7 +20,7 @@ class RBSide(Enum):
 
   @staticmethod
   def flip(side: 'RBSide') -> 'RBSide':
-    return RBSide.LEFT if side.value else RBSide.RIGHT
+    return RBSide.LEFT if side is RBSide.RIGHT else RBSide.RIGHT
 
 class RBColor(Enum):
   BLACK: bool = False
@@ -20,9 +28,11 @@ class RBColor(Enum):
 
   @staticmethod
   def flip(color: 'RBColor') -> 'RBColor':
-    return RBColor.BLACK if color.value else RBColor.RED
+    return RBColor.BLACK if color is RBColor.RED else RBColor.RED
 
-@dataclass
+# Nodes are slotted and compared by identity. Parent records are relinked
+# in place by rotations and swaps rather than reallocated.
+@dataclass(slots=True, eq=False)
 class RBNode[KT, VT]:
   key: KT
   value: VT
@@ -85,14 +95,35 @@ class RBNode[KT, VT]:
       node = node.left
     return prevNode
 
+  def next(self) -> Optional['RBNode']:
+    """In-order successor anywhere in the tree."""
+    if self.right is not None:
+      return self.successor()
+    node = self
+    while node.parent and node.side == RBSide.RIGHT:
+      node = node.parent.node
+    return node.parent.node if node.parent else None
+
+  def prev(self) -> Optional['RBNode']:
+    """In-order predecessor anywhere in the tree."""
+    node = self.left
+    if node is not None:
+      while node.right is not None:
+        node = node.right
+      return node
+    node = self
+    while node.parent and node.side == RBSide.LEFT:
+      node = node.parent.node
+    return node.parent.node if node.parent else None
+
   def isAdjacent(self, node: 'RBNode') -> Optional['RBNode']:
-    if self.parent and self.parent.node == node:
+    if self.parent and self.parent.node is node:
       return self
-    if node.parent and node.parent.node == self:
+    if node.parent and node.parent.node is self:
       return node
     return None
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class RBParent[KT, VT]:
   node: RBNode[KT, VT]
   side: RBSide
@@ -103,6 +134,9 @@ class RBParent[KT, VT]:
     if child is not None:
       child.parent = self
 
+# Detached subtree root with its black height.
+SubTree = Tuple[Optional[RBNode], int]
+
 def getColor(node: Optional[RBNode]) -> RBColor:
   if node is None or node.parent is None:
     return RBColor.BLACK
@@ -113,13 +147,93 @@ def setColor(node: Optional[RBNode], value: RBColor) -> None:
     return
   node.parent.color = value
 
-@dataclass
-class RBTree[KT, VT]:
+# Saved tree file: header, then the key column, then the value column.
+# Columns of ints or floats are raw native-endian arrays, so they can be read
+# in place from a memory map. A column of Nones takes no space; anything
+# else is pickled.
+_FILE_MAGIC = b'RBT1'
+_FILE_HEADER = struct.Struct('<4sccxcQ')
+_BYTE_ORDER = b'<' if sys.byteorder == 'little' else b'>'
+
+def _columnCode(items: List[Any]) -> str:
+  if all(x is None for x in items):
+    return 'n'
+  if all(type(x) is int and -2**63 <= x < 2**63 for x in items):
+    return 'q'
+  if all(type(x) is float for x in items):
+    return 'd'
+  return 'p'
+
+def _writeColumn(f: BinaryIO, code: str, items: List[Any]) -> None:
+  if code in 'qd':
+    array(code, items).tofile(f)
+  elif code == 'p':
+    data = pickle.dumps(items, protocol=pickle.HIGHEST_PROTOCOL)
+    f.write(struct.pack('<Q', len(data)))
+    f.write(data)
+    f.write(bytes(-len(data) % 8))
+
+def _readColumn(buf: memoryview, offset: int, code: str, n: int) -> Tuple[Sequence[Any], int]:
+  """Return a column and the offset just past it.
+
+  Array columns are views into buf and must be released before buf is.
+  """
+  if code in 'qd':
+    end = offset + 8*n
+    return buf[offset:end].cast(code), end
+  if code == 'p':
+    (size,) = struct.unpack_from('<Q', buf, offset)
+    start = offset + 8
+    items = pickle.loads(buf[start:start+size])
+    return items, start + size + (-size % 8)
+  return [None]*n, offset
+
+def _readColumns(buf: memoryview) -> Tuple[Sequence[Any], Sequence[Any]]:
+  magic, keyCode, valueCode, byteOrder, n = _FILE_HEADER.unpack_from(buf)
+  if magic != _FILE_MAGIC:
+    raise ValueError('Not a saved RBTree file.')
+  if byteOrder != _BYTE_ORDER:
+    raise ValueError('Saved RBTree file has the wrong byte order.')
+  keys, offset = _readColumn(buf, _FILE_HEADER.size, keyCode.decode(), n)
+  values, _ = _readColumn(buf, offset, valueCode.decode(), n)
+  return keys, values
+
+def _releaseColumn(column: Sequence[Any]) -> None:
+  if isinstance(column, memoryview):
+    column.release()
+
+class _ItemsView(ItemsView):
+  """items() in one ordered pass, duplicates included.
+
+  The Mapping default looks up every key again, which costs O(n log n)
+  and repeats the first value of a duplicated key.
+  """
+
+  def __iter__(self) -> Iterator[Tuple[Any, Any]]:
+    return self._mapping._iterItems()
+
+  def __contains__(self, item: object) -> bool:
+    return any(pair == item for pair in self)
+
+class _ValuesView(ValuesView):
+  def __iter__(self) -> Iterator[Any]:
+    for _, value in self._mapping._iterItems():
+      yield value
+
+@dataclass(eq=False)
+class RBTree[KT, VT](MutableMapping[KT, VT]):
   root: Optional[RBNode[KT, VT]] = None
+  # None once a split leaves the count unknown; recounted lazily.
+  _len: Optional[int] = field(default=0, init=False, repr=False)
 
   def __str__(self) -> str:
     return str(self.root)
 
+  def __len__(self) -> int:
+    if self._len is None:
+      self._len = sum(1 for _ in self._iterNodes())
+    return self._len
+
   def _reparent(self, parent: Optional[RBParent], child: Optional[RBNode]) -> None:
     if parent is None:
       self.root = child
@@ -128,6 +242,22 @@ class RBTree[KT, VT]:
     else:
       parent.reparent(child)
 
+  def _newNode(self, k: KT, v: VT) -> RBNode[KT, VT]:
+    return RBNode(k, v)
+
+  def _update(self, node: RBNode) -> None:
+    """Recompute augmented data of node from its children.
+
+    No-op for the plain tree. Called on both nodes after every rotation.
+    """
+
+  def _updatePath(self, node: Optional[RBNode]) -> None:
+    """Recompute augmented data from node up to the root.
+
+    No-op for the plain tree. Called after a node is linked or unlinked,
+    before any rebalancing.
+    """
+
   def _rotate(self, node: RBNode) -> None:
     """Rotate node with its parent.
 
@@ -136,16 +266,25 @@ class RBTree[KT, VT]:
       Left rotation: Left subtree +1, Middle subtree 0, Right subtree -1.
       Right rotation: Left subtree -1, Middle subtree 0, Right subtree +1.
     """
-    if node.parent is None:
+    nodeParent = node.parent
+    if nodeParent is None:
       return
-    parentNode = node.parent.node
-    middleNode = node.getChild(RBSide.flip(node.side))
-    nodeParent = parentNode.parent
-    parentParent = RBParent(node, RBSide.flip(node.side), getColor(node))
-    middleParent = RBParent(parentNode, node.side, getColor(middleNode))
-    self._reparent(nodeParent, node)
-    self._reparent(parentParent, parentNode)
-    self._reparent(middleParent, middleNode)
+    parentNode = nodeParent.node
+    side = nodeParent.side
+    flipSide = RBSide.flip(side)
+    middleNode = node.getChild(flipSide)
+    # node takes over the parent's record; its own record, still carrying
+    # its color, moves down to parentNode, and middleNode's moves across.
+    self._reparent(parentNode.parent, node)
+    nodeParent.node = node
+    nodeParent.side = flipSide
+    nodeParent.reparent(parentNode)
+    parentNode.setChild(side, middleNode)
+    if middleNode is not None:
+      middleNode.parent.node = parentNode
+      middleNode.parent.side = side
+    self._update(parentNode)
+    self._update(node)
 
   def _fixRed(self, node: RBNode) -> Optional[RBNode]:
     """Fix possible red-violation at node.
@@ -172,10 +311,10 @@ class RBTree[KT, VT]:
       self._rotate(parentNode)
     return None
 
-  def insert(self, k: KT, v: VT) -> None:
+  def insert(self, k: KT, v: VT) -> RBNode[KT, VT]:
+    """Insert after any equal keys and return the new node."""
     if self.root is None:
-      self.root = RBNode(k, v)
-      return
+      return self._link(None, RBSide.LEFT, k, v)
 
     parent = self.root
     side = None
@@ -185,11 +324,22 @@ class RBTree[KT, VT]:
       if child is None:
         break
       parent = child
+    return self._link(parent, side, k, v)
 
-    node = RBNode(k, v)
+  def _link(self, parent: Optional[RBNode], side: RBSide, k: KT, v: VT) -> RBNode[KT, VT]:
+    """Attach a new node as the empty side child of parent and rebalance."""
+    if self._len is not None:
+      self._len += 1
+    node = self._newNode(k, v)
+    if parent is None:
+      self.root = node
+      return node
     self._reparent(RBParent(parent, side, RBColor.RED), node)
-    while node is not None:
-      node = self._fixRed(node)
+    self._updatePath(parent)
+    fixNode = node
+    while fixNode is not None:
+      fixNode = self._fixRed(fixNode)
+    return node
 
   def _swapParents(self, n1: RBNode, n2: RBNode) -> None:
     n1Parent = n1.parent
@@ -200,23 +350,26 @@ class RBTree[KT, VT]:
   def _swapChildren(self, n1: RBNode, n2: RBNode, side: RBSide) -> None:
     n1Child = n1.getChild(side)
     n2Child = n2.getChild(side)
-    n1Parent = RBParent(n2, side, getColor(n1Child))
-    n2Parent = RBParent(n1, side, getColor(n2Child))
-    self._reparent(n1Parent, n1Child)
-    self._reparent(n2Parent, n2Child)
+    n1.setChild(side, n2Child)
+    n2.setChild(side, n1Child)
+    if n1Child is not None:
+      n1Child.parent.node = n2
+    if n2Child is not None:
+      n2Child.parent.node = n1
 
   def _swapNodes(self, n1: RBNode, n2: RBNode) -> None:
     childNode = n1.isAdjacent(n2)
     if childNode:
-      side = childNode.side
-      parentNode = childNode.parent.node
+      childParent = childNode.parent
+      side = childParent.side
+      parentNode = childParent.node
       gcNode = childNode.getChild(side)
-      childParent = RBParent(childNode, side, getColor(childNode))
-      parentParent = parentNode.parent
-      gcParent = RBParent(parentNode, side, getColor(gcNode))
-      self._reparent(childParent, parentNode)
-      self._reparent(parentParent, childNode)
-      self._reparent(gcParent, gcNode)
+      self._reparent(parentNode.parent, childNode)
+      childParent.node = childNode
+      childParent.reparent(parentNode)
+      parentNode.setChild(side, gcNode)
+      if gcNode is not None:
+        gcNode.parent.node = parentNode
       self._swapChildren(childNode, parentNode, RBSide.flip(side))
     else:
       self._swapParents(n1, n2)
@@ -250,6 +403,8 @@ class RBTree[KT, VT]:
     return parentNode.parent
 
   def removeNode(self, node: RBNode) -> None:
+    if self._len is not None:
+      self._len -= 1
     if node.left and node.right:
       succNode = node.successor()
       self._swapNodes(node, succNode)
@@ -257,6 +412,8 @@ class RBTree[KT, VT]:
     childNode = node.left or node.right
     self._reparent(parent, childNode)
     node.clear()
+    # Covers the successor swap too: its old position lies on this path.
+    self._updatePath(parent.node if parent else None)
     if childNode is not None:
       return
     if parent is not None and parent.color == RBColor.RED:
@@ -264,28 +421,870 @@ class RBTree[KT, VT]:
     while parent is not None:
       parent = self._fixBlack(parent)
 
+  def _first(self) -> Optional[RBNode[KT, VT]]:
+    node = self.root
+    while node is not None and node.left is not None:
+      node = node.left
+    return node
+
+  def _last(self) -> Optional[RBNode[KT, VT]]:
+    node = self.root
+    while node is not None and node.right is not None:
+      node = node.right
+    return node
+
+  def _floorNode(self, key: KT) -> Optional[RBNode[KT, VT]]:
+    """Last node with node.key <= key."""
+    found = None
+    node = self.root
+    while node is not None:
+      if key < node.key:
+        node = node.left
+      else:
+        found = node
+        node = node.right
+    return found
+
+  def _ceilingNode(self, key: KT) -> Optional[RBNode[KT, VT]]:
+    """First node with node.key >= key."""
+    found = None
+    node = self.root
+    while node is not None:
+      if node.key < key:
+        node = node.right
+      else:
+        found = node
+        node = node.left
+    return found
+
+  def iterRange(
+    self,
+    k1: KT,
+    k2: KT,
+    reverse: bool = False,
+  ) -> Iterator[RBNode[KT, VT]]:
+    """Lazily yield nodes with keys in [k1, k2].
+
+    Steps through parent links, so memory stays O(1). The step is taken
+    before each yield, so removing the yielded node is safe.
+    """
+    if reverse:
+      node = self._floorNode(k2)
+      while node is not None and not node.key < k1:
+        prevNode = node.prev()
+        yield node
+        node = prevNode
+    else:
+      node = self._ceilingNode(k1)
+      while node is not None and not k2 < node.key:
+        nextNode = node.next()
+        yield node
+        node = nextNode
+
+  def cursor(self) -> 'RBCursor[KT, VT]':
+    return RBCursor(self)
+
+  def find(self, key: KT) -> Optional[RBNode[KT, VT]]:
+    """Return the first node with key, in order, among any duplicates."""
+    found = None
+    node = self.root
+    while node is not None:
+      if node.key < key:
+        node = node.right
+      else:
+        if not key < node.key:
+          found = node
+        node = node.left
+    return found
+
+  def get(self, key: KT, default: Optional[VT] = None) -> Optional[VT]:
+    node = self.find(key)
+    return default if node is None else node.value
+
+  def __contains__(self, key: object) -> bool:
+    return self.find(key) is not None
+
+  def __getitem__(self, key: KT) -> VT:
+    node = self.find(key)
+    if node is None:
+      raise KeyError(key)
+    return node.value
+
+  def __setitem__(self, key: KT, value: VT) -> None:
+    """Update the value of key in place, or insert it if missing.
+
+    With duplicates of key, only the first (see find) is updated.
+    """
+    node = self.find(key)
+    if node is None:
+      self.insert(key, value)
+    else:
+      node.value = value
+
+  def __delitem__(self, key: KT) -> None:
+    """Remove the first node with key (see find)."""
+    node = self.find(key)
+    if node is None:
+      raise KeyError(key)
+    self.removeNode(node)
+
+  def __iter__(self) -> Iterator[KT]:
+    for node in self._iterNodes():
+      yield node.key
+
+  def _iterItems(self) -> Iterator[Tuple[KT, VT]]:
+    for node in self._iterNodes():
+      yield node.key, node.value
+
+  def items(self) -> ItemsView:
+    return _ItemsView(self)
+
+  def values(self) -> ValuesView:
+    return _ValuesView(self)
+
+  def clear(self) -> None:
+    self.root = None
+    self._len = 0
+
+  def floor(self, key: KT) -> Optional[RBNode[KT, VT]]:
+    return self._floorNode(key)
+
+  def ceiling(self, key: KT) -> Optional[RBNode[KT, VT]]:
+    return self._ceilingNode(key)
+
+  def min(self) -> Optional[RBNode[KT, VT]]:
+    return self._first()
+
+  def max(self) -> Optional[RBNode[KT, VT]]:
+    return self._last()
+
   def searchRange(self, k1: KT, k2: KT) -> List[RBNode]:
-    nodes = []
-    currNode = self.root
-    stack = []
-    while currNode or stack:
-      while currNode:
-        stack.append(currNode)
-        currNode = None if currNode.key < k1 else currNode.left
-      currNode = stack.pop()
-      if (not currNode.key < k1) and (not k2 < currNode.key):
-        nodes.append(currNode)
-      currNode = None if k2 < currNode.key else currNode.right
-    return nodes
+    return list(self.iterRange(k1, k2))
+
+  def _iterNodes(self) -> Iterator[RBNode[KT, VT]]:
+    node = self._first()
+    while node is not None:
+      nextNode = node.next()
+      yield node
+      node = nextNode
+
+  def _build(
+    self,
+    nodes: List[RBNode[KT, VT]],
+    left: int,
+    right: int,
+    depth: int,
+    redDepth: int,
+  ) -> Optional[RBNode[KT, VT]]:
+    """Link nodes[left:right] into a balanced subtree and return its root.
+
+    Halving keeps every level above redDepth full, so only the bottom level
+    can be partial. Coloring it red keeps all black heights equal.
+    """
+    if left >= right:
+      return None
+    mid = (left + right) // 2
+    node = nodes[mid]
+    childColor = RBColor.RED if depth+1 == redDepth else RBColor.BLACK
+    node.left = self._build(nodes, left, mid, depth+1, redDepth)
+    node.right = self._build(nodes, mid+1, right, depth+1, redDepth)
+    if node.left is not None:
+      node.left.parent = RBParent(node, RBSide.LEFT, childColor)
+    if node.right is not None:
+      node.right.parent = RBParent(node, RBSide.RIGHT, childColor)
+    self._update(node)
+    return node
+
+  def _buildFrom(self, nodes: List[RBNode[KT, VT]]) -> None:
+    n = len(nodes)
+    redDepth = n.bit_length() - 1 if n & (n+1) else -1
+    self.root = self._build(nodes, 0, n, 0, redDepth)
+    if self.root is not None:
+      self.root.parent = None
+    self._len = n
+
+  @classmethod
+  def fromSorted(cls, items: Iterable[Tuple[KT, VT]]) -> 'RBTree[KT, VT]':
+    """Build a tree from (key, value) pairs sorted by key in O(n)."""
+    tree = cls()
+    nodes = [tree._newNode(k, v) for k, v in items]
+    for i in range(1, len(nodes)):
+      if nodes[i].key < nodes[i-1].key:
+        raise ValueError('Expected items sorted by key.')
+    tree._buildFrom(nodes)
+    return tree
+
+  def save(self, path: str) -> None:
+    """Write the keys and values in order to path.
+
+    Layout is described above _FILE_MAGIC. The tree shape is not stored;
+    load rebuilds it with fromSorted in O(n).
+    """
+    nodes = list(self._iterNodes())
+    keys = [node.key for node in nodes]
+    values = [node.value for node in nodes]
+    keyCode = _columnCode(keys)
+    valueCode = _columnCode(values)
+    with open(path, 'wb') as f:
+      f.write(_FILE_HEADER.pack(
+        _FILE_MAGIC, keyCode.encode(), valueCode.encode(), _BYTE_ORDER, len(nodes)))
+      _writeColumn(f, keyCode, keys)
+      _writeColumn(f, valueCode, values)
+
+  @classmethod
+  def load(cls, path: str) -> 'RBTree[KT, VT]':
+    """Rebuild a tree saved with save in O(n), reading through a memory map."""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+      buf = memoryview(mm)
+      keys, values = _readColumns(buf)
+      try:
+        return cls.fromSorted(zip(keys, values))
+      finally:
+        _releaseColumn(keys)
+        _releaseColumn(values)
+        buf.release()
+
+  def insertMany(self, items: Iterable[Tuple[KT, VT]]) -> None:
+    """Insert a batch of (key, value) pairs.
+
+    Large batches are merged with the existing nodes and the tree is rebuilt
+    in O(n + m log m); small ones fall back to m single inserts. Existing
+    nodes are relinked, not copied, and keep their order among equal keys.
+    """
+    batch = sorted(items, key=lambda item: item[0])
+    m = len(batch)
+    n = len(self)
+    if m * (n+m).bit_length() < n:
+      for k, v in batch:
+        self.insert(k, v)
+      return
+    newNodes = [self._newNode(k, v) for k, v in batch]
+    nodes = list(merge(self._iterNodes(), newNodes, key=lambda node: node.key))
+    self._buildFrom(nodes)
+
+  def _blackHeight(self) -> int:
+    bh = 0
+    node = self.root
+    while node is not None:
+      bh += getColor(node) == RBColor.BLACK
+      node = node.left
+    return bh
+
+  def _detach(self, tree: SubTree) -> Tuple[SubTree, SubTree]:
+    """Cut a subtree root from its children and return them as subtrees.
+
+    The root is black, so each child loses one black level; a red child
+    turns black once it becomes a root and gets that level back.
+    """
+    root, rootBh = tree
+    subTrees = []
+    for child in (root.left, root.right):
+      if child is None:
+        subTrees.append((None, 0))
+      else:
+        bh = rootBh - 1 + (getColor(child) == RBColor.RED)
+        child.parent = None
+        subTrees.append((child, bh))
+    root.clear()
+    self._update(root)
+    return subTrees[0], subTrees[1]
+
+  def _join(self, left: SubTree, mid: RBNode, right: SubTree) -> SubTree:
+    """Join left, mid and right into one subtree in O(|bh(left) - bh(right)|).
+
+    Expects detached roots and left <= mid <= right by key. The shorter
+    subtree hangs under mid, which replaces the first black node of matching
+    black height on the inner spine of the taller one.
+    """
+    (leftNode, leftBh), (rightNode, rightBh) = left, right
+    if leftBh == rightBh:
+      mid.left = leftNode
+      mid.right = rightNode
+      if leftNode is not None:
+        leftNode.parent = RBParent(mid, RBSide.LEFT, RBColor.BLACK)
+      if rightNode is not None:
+        rightNode.parent = RBParent(mid, RBSide.RIGHT, RBColor.BLACK)
+      self._update(mid)
+      return mid, leftBh + 1
+    if leftBh > rightBh:
+      side, bh, node, shortNode, shortBh = RBSide.RIGHT, leftBh, leftNode, rightNode, rightBh
+    else:
+      side, bh, node, shortNode, shortBh = RBSide.LEFT, rightBh, rightNode, leftNode, leftBh
+    self.root = node
+    h = bh
+    parentNode = None
+    while node is not None and not (h == shortBh and getColor(node) == RBColor.BLACK):
+      h -= getColor(node) == RBColor.BLACK
+      parentNode = node
+      node = node.getChild(side)
+    mid.setChild(RBSide.flip(side), node)
+    if node is not None:
+      node.parent = RBParent(mid, RBSide.flip(side), RBColor.BLACK)
+    mid.setChild(side, shortNode)
+    if shortNode is not None:
+      shortNode.parent = RBParent(mid, side, RBColor.BLACK)
+    self._reparent(RBParent(parentNode, side, RBColor.RED), mid)
+    self._update(mid)
+    self._updatePath(parentNode)
+    node = mid
+    while node is not None:
+      node = self._fixRed(node)
+      # A recolor that reaches the (always black) root adds a black level.
+      if node is not None and node.parent is None:
+        bh += 1
+    return self.root, bh
+
+  def _joinTwo(self, left: SubTree, right: SubTree) -> SubTree:
+    rightNode, _ = right
+    if rightNode is None:
+      return left
+    self.root = rightNode
+    mid = self._first()
+    self.removeNode(mid)
+    mid.clear()
+    return self._join(left, mid, (self.root, self._blackHeight()))
+
+  def _split(self, tree: SubTree, key: KT, left: bool) -> Tuple[SubTree, SubTree]:
+    """Split into keys below key and the rest.
+
+    Below means strictly less if left, else less or equal. Joins telescope
+    along the search path, so the whole split is O(log n).
+    """
+    root, bh = tree
+    if root is None:
+      return (None, 0), (None, 0)
+    goesRight = not root.key < key if left else key < root.key
+    leftTree, rightTree = self._detach(tree)
+    if goesRight:
+      lower, upper = self._split(leftTree, key, left)
+      return lower, self._join(upper, root, rightTree)
+    else:
+      lower, upper = self._split(rightTree, key, left)
+      return self._join(leftTree, root, lower), upper
+
+  def _fromSubTree(self, tree: SubTree) -> 'RBTree[KT, VT]':
+    other = self.__class__()
+    other.root = tree[0]
+    other._len = None
+    return other
+
+  def _setSubTree(self, tree: SubTree) -> None:
+    self.root = tree[0]
+    self._len = None
+
+  def split(self, key: KT) -> Tuple['RBTree[KT, VT]', 'RBTree[KT, VT]']:
+    """Split into trees with keys < key and keys >= key in O(log n).
+
+    Nodes are moved, not copied, and this tree is left empty.
+    """
+    lower, upper = self._split((self.root, self._blackHeight()), key, True)
+    self.root = None
+    self._len = 0
+    return self._fromSubTree(lower), self._fromSubTree(upper)
+
+  @classmethod
+  def join(cls, left: 'RBTree[KT, VT]', right: 'RBTree[KT, VT]') -> 'RBTree[KT, VT]':
+    """Concatenate two trees in O(log n).
+
+    Every key in left must be <= every key in right. Both inputs are left
+    empty.
+    """
+    if left.root is not None and right.root is not None:
+      if right._first().key < left._last().key:
+        raise ValueError('Expected left keys <= right keys.')
+    tree = cls()
+    leftTree = (left.root, left._blackHeight())
+    rightTree = (right.root, right._blackHeight())
+    tree._setSubTree(tree._joinTwo(leftTree, rightTree))
+    for t in (left, right):
+      t.root = None
+      t._len = 0
+    return tree
+
+  def _splitRange(self, k1: KT, k2: KT) -> Tuple[SubTree, SubTree, SubTree]:
+    lower, rest = self._split((self.root, self._blackHeight()), k1, True)
+    middle, upper = self._split(rest, k2, False)
+    return lower, middle, upper
+
+  def extractRange(self, k1: KT, k2: KT) -> 'RBTree[KT, VT]':
+    """Move nodes with keys in [k1, k2] into a new tree in O(log n).
+
+    On a plain RBTree both sizes are then unknown and cost a walk on the
+    next len(); an OSTree reads them off its roots.
+    """
+    if k2 < k1:
+      return self.__class__()
+    lower, middle, upper = self._splitRange(k1, k2)
+    self._setSubTree(self._joinTwo(lower, upper))
+    return self._fromSubTree(middle)
 
   def removeRange(self, k1: KT, k2: KT) -> List[RBNode]:
-    nodes = self.searchRange(k1, k2)
+    """Remove nodes with keys in [k1, k2] in O(log n + k)."""
+    if k2 < k1:
+      return []
+    old = self._len
+    nodes = list(self.extractRange(k1, k2)._iterNodes())
+    if old is not None:
+      self._len = old - len(nodes)
     for node in nodes:
-      self.removeNode(node)
+      node.clear()
     return nodes
 
+  def _union(self, t1: SubTree, t2: SubTree) -> SubTree:
+    root, _ = t1
+    if root is None:
+      return t2
+    if t2[0] is None:
+      return t1
+    key = root.key
+    left1, right1 = self._detach(t1)
+    left2, rest = self._split(t2, key, True)
+    _, right2 = self._split(rest, key, False)
+    left = self._union(left1, left2)
+    right = self._union(right1, right2)
+    return self._join(left, root, right)
+
+  def _filter(
+    self,
+    t1: SubTree,
+    t2: SubTree,
+    keep: bool,
+    lowHit: bool,
+    highHit: bool,
+    low: Optional[KT] = None,
+    high: Optional[KT] = None,
+  ) -> SubTree:
+    """Keep nodes of t1 whose key is in t2 if keep, else those not in t2.
+
+    low/high are the keys t2 was split at on the way down. Their hit flags
+    record whether t2 had them, which duplicate keys in t1 still need.
+    """
+    root, _ = t1
+    if root is None:
+      return t1
+    if t2[0] is None and not lowHit and not highHit:
+      return t1 if not keep else (None, 0)
+    key = root.key
+    left1, right1 = self._detach(t1)
+    left2, rest = self._split(t2, key, True)
+    equal, right2 = self._split(rest, key, False)
+    hit = (
+      equal[0] is not None
+      or (lowHit and not low < key)
+      or (highHit and not key < high)
+    )
+    left = self._filter(left1, left2, keep, lowHit, hit, low, key)
+    right = self._filter(right1, right2, keep, hit, highHit, key, high)
+    if hit == keep:
+      return self._join(left, root, right)
+    return self._joinTwo(left, right)
+
+  def _setOp(self, other: 'RBTree[KT, VT]', op: str) -> None:
+    t1 = (self.root, self._blackHeight())
+    t2 = (other.root, other._blackHeight())
+    if op == 'union':
+      result = self._union(t1, t2)
+    else:
+      result = self._filter(t1, t2, op == 'intersection', False, False)
+    self._setSubTree(result)
+    other.root = None
+    other._len = 0
+
+  def union(self, other: 'RBTree[KT, VT]') -> None:
+    """Add the nodes of other whose keys are not already in this tree.
+
+    Join-based, so O(m log(n/m + 1)) for m <= n. Other is left empty.
+    """
+    self._setOp(other, 'union')
+
+  def intersection(self, other: 'RBTree[KT, VT]') -> None:
+    """Keep only nodes whose keys are also in other. Other is left empty."""
+    self._setOp(other, 'intersection')
+
+  def difference(self, other: 'RBTree[KT, VT]') -> None:
+    """Drop nodes whose keys are in other. Other is left empty."""
+    self._setOp(other, 'difference')
+
+@dataclass
+class RBCursor[KT, VT]:
+  """Movable position in a tree.
+
+  Every move returns the new node, or None once the cursor runs off either
+  end. Mutating the tree invalidates the cursor unless it is re-seeked.
+  """
+  tree: RBTree[KT, VT]
+  node: Optional[RBNode[KT, VT]] = None
+
+  def first(self) -> Optional[RBNode[KT, VT]]:
+    self.node = self.tree._first()
+    return self.node
+
+  def last(self) -> Optional[RBNode[KT, VT]]:
+    self.node = self.tree._last()
+    return self.node
+
+  def floor(self, key: KT) -> Optional[RBNode[KT, VT]]:
+    self.node = self.tree._floorNode(key)
+    return self.node
+
+  def ceiling(self, key: KT) -> Optional[RBNode[KT, VT]]:
+    self.node = self.tree._ceilingNode(key)
+    return self.node
+
+  def next(self) -> Optional[RBNode[KT, VT]]:
+    if self.node is not None:
+      self.node = self.node.next()
+    return self.node
+
+  def prev(self) -> Optional[RBNode[KT, VT]]:
+    if self.node is not None:
+      self.node = self.node.prev()
+    return self.node
+
+@dataclass(slots=True, eq=False)
+class OSNode[KT, VT](RBNode[KT, VT]):
+  size: int = 1
+
+def getSize(node: Optional[OSNode]) -> int:
+  return 0 if node is None else node.size
+
+@dataclass(eq=False)
+class OSTree[KT, VT](RBTree[KT, VT]):
+  """Order-statistic tree.
+
+  Every node tracks the size of its subtree, so rank and select queries
+  take one root-to-leaf descent.
+  """
+
+  def __len__(self) -> int:
+    return getSize(self.root)
+
+  def _newNode(self, k: KT, v: VT) -> OSNode[KT, VT]:
+    return OSNode(k, v)
+
+  def _update(self, node: OSNode) -> None:
+    node.size = 1 + getSize(node.left) + getSize(node.right)
+
+  def _updatePath(self, node: Optional[OSNode]) -> None:
+    while node is not None:
+      self._update(node)
+      node = node.parent.node if node.parent else None
+
+  def select(self, k: int) -> OSNode[KT, VT]:
+    """Return the node with the k-th smallest key (0-indexed)."""
+    if not 0 <= k < len(self):
+      raise IndexError(f'Rank {k} out of range.')
+    node = self.root
+    while True:
+      leftSize = getSize(node.left)
+      if k < leftSize:
+        node = node.left
+      elif k > leftSize:
+        k -= leftSize + 1
+        node = node.right
+      else:
+        return node
+
+  def rank(self, key: KT, *, left: bool = True) -> int:
+    """Count keys below key.
+
+    Matches rank.getRank: strictly less if left, else less or equal.
+    """
+    rank = 0
+    node = self.root
+    while node is not None:
+      if node.key < key or (not left and not key < node.key):
+        rank += getSize(node.left) + 1
+        node = node.right
+      else:
+        node = node.left
+    return rank
+
+  def countRange(self, k1: KT, k2: KT) -> int:
+    """Count keys in [k1, k2], same bounds as searchRange."""
+    if k2 < k1:
+      return 0
+    return self.rank(k2, left=False) - self.rank(k1)
+
+class MappedIndex[KT, VT](Mapping[KT, VT]):
+  """Read-only sorted index served straight from a saved tree file.
+
+  Int and float columns are never copied: lookups binary search the memory
+  map, so processes opening the same file share its pages. Close it, or
+  use it as a context manager, to release the map.
+  """
+
+  def __init__(self, path: str) -> None:
+    self._file = open(path, 'rb')
+    try:
+      self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+    except BaseException:
+      self._file.close()
+      raise
+    self._buf = memoryview(self._mmap)
+    try:
+      self._keys, self._values = _readColumns(self._buf)
+    except BaseException:
+      self._buf.release()
+      self._mmap.close()
+      self._file.close()
+      raise
+
+  def close(self) -> None:
+    _releaseColumn(self._keys)
+    _releaseColumn(self._values)
+    self._buf.release()
+    self._mmap.close()
+    self._file.close()
+
+  def __enter__(self) -> 'MappedIndex[KT, VT]':
+    return self
+
+  def __exit__(self, *args: Any) -> None:
+    self.close()
+
+  def __len__(self) -> int:
+    return len(self._keys)
+
+  def __iter__(self) -> Iterator[KT]:
+    return iter(self._keys)
+
+  def _iterItems(self) -> Iterator[Tuple[KT, VT]]:
+    return zip(self._keys, self._values)
+
+  def items(self) -> ItemsView:
+    return _ItemsView(self)
+
+  def values(self) -> ValuesView:
+    return _ValuesView(self)
+
+  def _index(self, key: KT) -> int:
+    i = bisect_left(self._keys, key)
+    if i == len(self._keys) or key < self._keys[i]:
+      return -1
+    return i
+
+  def __contains__(self, key: object) -> bool:
+    return self._index(key) >= 0
+
+  def __getitem__(self, key: KT) -> VT:
+    i = self._index(key)
+    if i < 0:
+      raise KeyError(key)
+    return self._values[i]
+
+  def floor(self, key: KT) -> Optional[Tuple[KT, VT]]:
+    i = bisect_right(self._keys, key) - 1
+    return (self._keys[i], self._values[i]) if i >= 0 else None
+
+  def ceiling(self, key: KT) -> Optional[Tuple[KT, VT]]:
+    i = bisect_left(self._keys, key)
+    return (self._keys[i], self._values[i]) if i < len(self._keys) else None
+
+  def iterRange(self, k1: KT, k2: KT, reverse: bool = False) -> Iterator[Tuple[KT, VT]]:
+    """Lazily yield (key, value) pairs with keys in [k1, k2]."""
+    i = bisect_left(self._keys, k1)
+    j = bisect_right(self._keys, k2)
+    indices = range(j-1, i-1, -1) if reverse else range(i, j)
+    for index in indices:
+      yield self._keys[index], self._values[index]
+
+def _checkTree(tree: RBTree) -> int:
+  """Check the red-black invariants and return the black height."""
+  def check(node: Optional[RBNode]) -> int:
+    if node is None:
+      return 1
+    for side in (RBSide.LEFT, RBSide.RIGHT):
+      child = node.getChild(side)
+      if child is not None:
+        assert child.parent.node is node and child.parent.side == side
+        assert not (getColor(node) == RBColor.RED and getColor(child) == RBColor.RED)
+    if node.left is not None:
+      assert not node.key < node.left.key
+    if node.right is not None:
+      assert not node.right.key < node.key
+    leftHeight = check(node.left)
+    assert leftHeight == check(node.right)
+    if isinstance(node, OSNode):
+      assert node.size == 1 + getSize(node.left) + getSize(node.right)
+    return leftHeight + (getColor(node) == RBColor.BLACK)
+  assert tree.root is None or tree.root.parent is None
+  return check(tree.root)
+
+def _runTest() -> None:
+  import random
+  t = OSTree()
+  xs = list(range(2000))
+  random.shuffle(xs)
+  for x in xs:
+    t.insert(x, None)
+  _checkTree(t)
+  assert [t.select(i).key for i in range(len(xs))] == list(range(len(xs)))
+  assert t.rank(500) == 500 and t.rank(500, left=False) == 501
+  assert t.countRange(10, 19) == 10 and t.countRange(19, 10) == 0
+  # Trees compare as mappings, by contents.
+  assert t == OSTree.fromSorted((x, None) for x in range(2000))
+  assert RBTree.fromSorted([(1, 'x')]) == {1: 'x'} != RBTree.fromSorted([(1, 'y')])
+  # Duplicates: lookups take the first, views show every node in order.
+  dup = RBTree.fromSorted([(0, 'z'), (1, 'a'), (1, 'b'), (1, 'a'), (2, 'c')])
+  assert dup[1] == 'a' and list(dup.values()) == ['z', 'a', 'b', 'a', 'c']
+  assert (1, 'b') in dup.items() and list(dup.items())[2] == (1, 'b')
+  dup[1] = 'x'
+  assert [v for k, v in dup.items() if k == 1] == ['x', 'b', 'a']
+  del dup[1]
+  assert [v for k, v in dup.items() if k == 1] == ['b', 'a']
+  for _ in range(20):
+    dup.insert(1, 'y')
+    assert dup.find(1) is dup._ceilingNode(1)
+  random.shuffle(xs)
+  for i, x in enumerate(xs):
+    nodes = t.searchRange(x, x)
+    t.removeNode(nodes[0])
+    if i % 100 == 0:
+      _checkTree(t)
+      assert len(t) == len(xs) - i - 1
+  assert t.root is None
+
+  for n in range(40):
+    t = OSTree.fromSorted((x, str(x)) for x in range(n))
+    _checkTree(t)
+    assert len(t) == n and [node.key for node in t._iterNodes()] == list(range(n))
+  t = RBTree.fromSorted([])
+  for batch in ([5, 3, 9], list(range(100)), [7]*3, list(range(50, 5000))):
+    random.shuffle(batch)
+    before = len(t)
+    t.insertMany((x, None) for x in batch)
+    _checkTree(t)
+    keys = [node.key for node in t._iterNodes()]
+    assert len(t) == before + len(batch) and keys == sorted(keys)
+
+  t = RBTree.fromSorted((x // 3, x) for x in range(300))
+  assert [n.value for n in t.iterRange(10, 12)] == list(range(30, 39))
+  assert [n.value for n in t.iterRange(10, 12, reverse=True)] == list(range(38, 29, -1))
+  assert list(t.iterRange(12, 10)) == [] and list(t.iterRange(100, 200)) == []
+  it = t.iterRange(0, 99)
+  for node in it:
+    t.removeNode(node)
+  assert t.root is None
+  t = RBTree.fromSorted((x, x) for x in range(0, 100, 2))
+  cur = t.cursor()
+  assert cur.ceiling(11).key == 12 and cur.next().key == 14 and cur.prev().key == 12
+  assert cur.floor(11).key == 10 and cur.floor(-1) is None and cur.next() is None
+  assert cur.ceiling(99) is None and cur.last().key == 98 and cur.next() is None
+  assert cur.first().key == 0 and cur.prev() is None
+
+  for cls in (RBTree, OSTree):
+    for _ in range(30):
+      n = random.randrange(300)
+      xs = sorted(random.randrange(100) for _ in range(n))
+      t = cls()
+      for x in xs:
+        t.insert(x, None)
+      k = random.randrange(-5, 105)
+      lower, upper = t.split(k)
+      _checkTree(lower)
+      _checkTree(upper)
+      assert t.root is None and len(lower) + len(upper) == n
+      assert [node.key for node in lower._iterNodes()] == [x for x in xs if x < k]
+      t = cls.join(lower, upper)
+      _checkTree(t)
+      assert [node.key for node in t._iterNodes()] == xs
+      k1, k2 = sorted(random.randrange(-5, 105) for _ in range(2))
+      removed = t.removeRange(k1, k2)
+      _checkTree(t)
+      assert [node.key for node in removed] == [x for x in xs if k1 <= x <= k2]
+      assert len(t) == n - len(removed)
+      # Known sizes stay known, so len() after a range removal is O(1).
+      t = cls.fromSorted((x, None) for x in xs)
+      t.removeRange(k1, k2)
+      assert t._len == n - len(removed)
+      part = t.extractRange(k1, k2)
+      assert len(t) == n - len(removed) and len(part) == 0
+      ys = [random.randrange(100) for _ in range(random.randrange(100))]
+      for op in ('union', 'intersection', 'difference'):
+        t = cls.fromSorted((x, 0) for x in xs)
+        other = cls.fromSorted((y, 1) for y in sorted(ys))
+        getattr(t, op)(other)
+        _checkTree(t)
+        keys = [(node.key, node.value) for node in t._iterNodes()]
+        if op == 'union':
+          expected = sorted([(x, 0) for x in xs] + [(y, 1) for y in ys if y not in xs])
+        elif op == 'intersection':
+          expected = [(x, 0) for x in xs if x in ys]
+        else:
+          expected = [(x, 0) for x in xs if x not in ys]
+        assert keys == expected, op
+        assert len(t) == len(expected) and other.root is None
+
+  t = OSTree()
+  for x in random.sample(range(0, 200, 2), 100):
+    t[x] = -x
+  _checkTree(t)
+  t[10] = 'ten'
+  assert len(t) == 100 and t[10] == 'ten' and t.get(11) is None and t.get(11, 0) == 0
+  assert 12 in t and 13 not in t and t.find(13) is None and t.find(12).value == -12
+  assert t.floor(13).key == 12 and t.ceiling(13).key == 14 and t.floor(-1) is None
+  assert t.min().key == 0 and t.max().key == 198 and list(t)[:3] == [0, 2, 4]
+  for x in range(0, 200, 4):
+    del t[x]
+  _checkTree(t)
+  assert len(t) == 50 and list(t) == list(range(2, 200, 4))
+  try:
+    del t[0]
+    assert False
+  except KeyError:
+    pass
+  t.clear()
+  assert len(t) == 0 and t.min() is None
+
+  import os
+  import tempfile
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, 'tree.rbt')
+    for items in (
+      [],
+      [(x // 2, x * 0.5) for x in range(1001)],
+      [(float(x), None) for x in range(100)],
+      [(str(x), [x]) for x in range(100)],
+    ):
+      items.sort()
+      OSTree.fromSorted(items).save(path)
+      t = OSTree.load(path)
+      _checkTree(t)
+      assert [(node.key, node.value) for node in t._iterNodes()] == items
+      with MappedIndex(path) as index:
+        assert len(index) == len(items) and list(index) == [k for k, _ in items]
+        first = {}
+        for k, v in items:
+          first.setdefault(k, v)
+        for k, v in items[::7]:
+          assert k in index and index[k] == first[k]
+        if items:
+          lo, hi = items[len(items)//4][0], items[len(items)//2][0]
+          expected = [(k, v) for k, v in items if lo <= k <= hi]
+          assert list(index.iterRange(lo, hi)) == expected
+          assert list(index.iterRange(lo, hi, reverse=True)) == expected[::-1]
+          assert index.floor(hi) == expected[-1] and index.ceiling(lo) == expected[0]
+        assert list(index.keys()) == [k for k, _ in items]
+        assert list(index.values()) == [v for _, v in items]
+        assert list(index.items()) == items
+    with open(path, 'wb') as f:
+      f.write(b'JUNK' + bytes(60))
+    try:
+      MappedIndex(path)
+      assert False
+    except ValueError:
+      pass
+  try:
+    RBTree.fromSorted([(2, None), (1, None)])
+    assert False
+  except ValueError:
+    pass
+  print('Nice!')
+
 if __name__ == '__main__':
   import random
+  _runTest()
   t = RBTree()
   xs = list(range(10000))
   random.shuffle(xs)
@@ -293,6 +1292,5 @@ if __name__ == '__main__':
     t.insert(x, None)
   random.shuffle(xs)
   for x in xs:
-    nodes = t.searchRange(x, x)
-    t.removeNode(nodes[0])
+    del t[x]
   print(t.root)
@@ -3,8 +3,17 @@ Consideration: Finetuning memory access patterns may speed things up by avoiding
 misses. Though, you probably want to run a perf test first to see if the optimizations
 are necessary.
 """
+from array import array
+from collections.abc import Sequence
+from copy import copy
+from itertools import chain
 from math import gcd
-from typing import List, Any
+from typing import List, Any, Iterator, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 def swap(arr: List[Any], i: int, j: int) -> None:
     """In-place swap.
@@ -74,6 +83,226 @@ def shift_reverse(arr: List[Any], k: int) -> None:
     _reverse(arr, 0, k-1)
     _reverse(arr, k, n-1)
 
+def _byte_view(arr: Any) -> Optional[memoryview]:
+    """Writable, C-contiguous byte view of arr, or None."""
+    try:
+        view = memoryview(arr)
+    except TypeError:
+        return None
+    if view.readonly or not view.c_contiguous:
+        view.release()
+        return None
+    return view.cast('B')
+
+def _snapshot(block: Any) -> Any:
+    if isinstance(block, memoryview):
+        return block.tobytes()
+    if isinstance(block, (list, bytearray, array)):
+        return block  # Slicing already copied.
+    return copy(block)  # e.g. NumPy slices are views.
+
+def _swap_blocks(buf: Any, i: int, j: int, m: int, scratch: int) -> None:
+    """Swap buf[i:i+m] and buf[j:j+m] (disjoint), scratch items at a time."""
+    for c in range(0, m, scratch):
+        e = min(c + scratch, m)
+        temp = _snapshot(buf[i+c:i+e])
+        buf[i+c:i+e] = buf[j+c:j+e]
+        buf[j+c:j+e] = temp
+
+def _slide(buf: Any, lo: int, d: int, hi: int) -> None:
+    """Rotate buf[lo:hi] left by d, setting the shorter side aside."""
+    m = hi - lo
+    if isinstance(buf, list):
+        # del/insert memmove pointers; slice assignment would copy the longer side.
+        if d <= m - d:
+            temp = buf[lo:lo+d]
+            del buf[lo:lo+d]
+            buf[hi-d:hi-d] = temp
+        else:
+            temp = buf[lo+d:hi]
+            del buf[lo+d:hi]
+            buf[lo:lo] = temp
+    elif d <= m - d:
+        temp = _snapshot(buf[lo:lo+d])
+        buf[lo:hi-d] = buf[lo+d:hi]
+        buf[hi-d:hi] = temp
+    else:
+        temp = _snapshot(buf[lo+d:hi])
+        buf[lo+m-d:hi] = buf[lo:lo+d]
+        buf[lo:lo+m-d] = temp
+
+def _rotate_left(buf: Any, lo: int, d: int, hi: int, scratch: int) -> None:
+    """Rotate buf[lo:hi] left by d, with at most scratch items of copies.
+
+    Gries-Mills block swapping: swap the shorter side into its final place
+    and recurse on the rest, until the shorter side fits in scratch and one
+    memmove finishes the job. Every swap moves more than scratch items, so
+    there are O(n / scratch) slice operations.
+    """
+    while min(d, hi - lo - d) > scratch:
+        a, b = d, hi - lo - d
+        if a <= b:
+            _swap_blocks(buf, lo, hi - a, a, scratch)
+            hi -= a
+        else:
+            _swap_blocks(buf, lo, lo + a, b, scratch)
+            lo += b
+            d = a - b
+    _slide(buf, lo, d, hi)
+
+def shift_block(arr: Any, k: int, scratch_bytes: int = 1 << 16) -> None:
+    """In-place shift with bulk slice moves and bounded scratch.
+
+    Buffers (bytearray, array.array, contiguous NumPy arrays) are moved as
+    raw bytes through a memoryview, so each move is one memmove; rows of a
+    2-D array move as units. Lists move pointers through list slicing.
+    Reads[~n] and Writes[~n], in chunks of scratch_bytes.
+    """
+    n = len(arr)
+    if n == 0:
+        return
+    k = k % n
+    if k == 0:
+        return
+    view = _byte_view(arr)
+    if view is None:
+        _rotate_left(arr, 0, n-k, n, max(1, scratch_bytes // 8))
+        return
+    width = view.nbytes // n
+    try:
+        _rotate_left(view, 0, (n-k) * width, n * width, max(width, scratch_bytes))
+    finally:
+        view.release()
+
+# Below this size, setting up views and slices costs more than moving
+# elements one by one. See _run_benchmark.
+_AUTO_MIN_SIZE = 16
+
+def shift_auto(arr: Any, k: int) -> None:
+    """In-place shift that picks the engine for arr.
+
+    Tiny arrays and sequences without slice assignment use shift_cycle,
+    which writes each element once. Everything else uses shift_block: a
+    C-level memmove beats any per-element Python loop, whatever k is and
+    however wide the elements are. Plain lists also use it, moving
+    pointers instead of objects.
+    """
+    n = len(arr)
+    if n < _AUTO_MIN_SIZE:
+        shift_cycle(arr, k)
+        return
+    try:
+        arr[0:0]
+    except TypeError:
+        shift_cycle(arr, k)
+        return
+    shift_block(arr, k)
+
+def _join(a: Any, b: Any) -> Any:
+    """Concatenate two slices of the same base."""
+    if np is not None and isinstance(a, np.ndarray):
+        return np.concatenate((a, b))
+    if isinstance(a, memoryview):
+        return memoryview(a.tobytes() + b.tobytes()).cast(a.format)
+    return a + b
+
+class RotatedView(Sequence):
+    """Shifted view of arr that moves no data until asked to.
+
+    view[i] is arr[(start + i) % n]. shift(k) only moves start, so
+    RotatedView(arr, k) reads like shift_simple(arr, k) without the copy.
+    Indexing is O(1) and a slice costs at most two slices of arr. Writes
+    through the view land in arr at the remapped index.
+
+    materialize() rotates arr in place with shift_auto and hands it back,
+    as does taking a buffer of the view (memoryview(view), NumPy, ...).
+    Resizing arr behind the view's back is not supported.
+    """
+
+    __slots__ = ('arr', 'start')
+
+    def __init__(self, arr: Any, k: int = 0) -> None:
+        self.arr = arr
+        self.start = 0
+        self.shift(k)
+
+    def shift(self, k: int) -> None:
+        """Logical shift_cycle(self, k). O(1)."""
+        n = len(self.arr)
+        if n:
+            self.start = (self.start - k) % n
+
+    def __len__(self) -> int:
+        return len(self.arr)
+
+    def _index(self, i: int) -> int:
+        n = len(self.arr)
+        if not -n <= i < n:
+            raise IndexError('RotatedView index out of range')
+        return (self.start + i) % n
+
+    def _span(self, lo: int, hi: int) -> Any:
+        """Logical [lo, hi) for 0 <= lo <= hi <= n."""
+        n = len(self.arr)
+        a, b = self.start + lo, self.start + hi
+        if b <= n:
+            return self.arr[a:b]
+        if n <= a:
+            return self.arr[a-n:b-n]
+        return _join(self.arr[a:n], self.arr[0:b-n])
+
+    def __getitem__(self, i: Any) -> Any:
+        if not isinstance(i, slice):
+            return self.arr[self._index(i)]
+        r = range(*i.indices(len(self.arr)))
+        if r.step == 1 or not r:
+            return self._span(r.start, max(r.start, r.stop))
+        lo, hi = min(r), max(r) + 1
+        return self._span(lo, hi)[r.start - lo::r.step]
+
+    def __setitem__(self, i: Any, value: Any) -> None:
+        if not isinstance(i, slice):
+            self.arr[self._index(i)] = value
+            return
+        n = len(self.arr)
+        r = range(*i.indices(n))
+        if len(value) != len(r):
+            raise ValueError(f'Cannot resize a RotatedView: {len(value)} values for {len(r)} slots.')
+        if r.step != 1:
+            for j, v in zip(r, value):
+                self.arr[(self.start + j) % n] = v
+            return
+        a, b = self.start + r.start, self.start + r.stop
+        if n <= a:
+            self.arr[a-n:b-n] = value
+        elif b <= n:
+            self.arr[a:b] = value
+        else:
+            self.arr[a:n] = value[:n-a]
+            self.arr[0:b-n] = value[n-a:]
+
+    def __iter__(self) -> Iterator[Any]:
+        # By index, so a pass reads n items however far start is.
+        n, start = len(self.arr), self.start
+        return map(self.arr.__getitem__, chain(range(start, n), range(start)))
+
+    def __reversed__(self) -> Iterator[Any]:
+        n, start = len(self.arr), self.start
+        return map(self.arr.__getitem__, chain(range(start-1, -1, -1), range(n-1, start-1, -1)))
+
+    def materialize(self) -> Any:
+        """Rotate arr in place to match the view, and return it."""
+        if self.start:
+            shift_auto(self.arr, -self.start)
+            self.start = 0
+        return self.arr
+
+    def __buffer__(self, flags: int) -> memoryview:
+        return memoryview(self.materialize())
+
+    def __repr__(self) -> str:
+        return f'RotatedView({self.arr!r}, {-self.start % max(1, len(self.arr))})'
+
 nk = [
     (5, 0),
     (5, 2),
@@ -83,6 +312,11 @@ nk = [
     (12, 4),
     (12, 5),
     (12, 6),
+    (40, 3),
+    (40, 37),
+    (97, 40),
+    (100, -30),
+    (100, 50),
 ]
 
 def check(n: int, k: int) -> None:
@@ -92,6 +326,40 @@ def check(n: int, k: int) -> None:
     shift_cycle(arr_cycle, k)
     arr_reverse = list(arr)
     shift_reverse(arr_reverse, k)
+    for scratch_bytes in (8, 16, 1 << 16):
+        arr_block = list(arr)
+        shift_block(arr_block, k, scratch_bytes)
+        buf_block = array('q', arr)
+        shift_block(buf_block, k, scratch_bytes)
+        bytes_block = bytearray(arr)
+        shift_block(bytes_block, k, scratch_bytes)
+        if arr_block != arr_simple or list(buf_block) != arr_simple or list(bytes_block) != arr_simple:
+            print(f'Block {n} {k} {scratch_bytes}:')
+            print(arr_block, list(buf_block), list(bytes_block))
+    arr_auto = list(arr)
+    shift_auto(arr_auto, k)
+    if arr_auto != arr_simple:
+        print(f'Auto {n} {k}:')
+        print(arr_auto)
+    view = RotatedView(list(arr))
+    for step in (2 * k, -3 * k, 2 * k + 1, -1):
+        view.shift(step)
+    n_slices = [slice(None), slice(2, None), slice(None, -3), slice(1, n - 1, 2), slice(None, None, -1), slice(-2, 0, -3)]
+    view_bytes = RotatedView(bytearray(arr), k)
+    if list(view) != arr_simple or list(reversed(view)) != arr_simple[::-1] \
+            or [view[i] for i in range(-n, n)] != arr_simple + arr_simple \
+            or any(view[s] != arr_simple[s] or list(view_bytes[s]) != arr_simple[s] for s in n_slices) \
+            or view.materialize() != arr_simple or bytes(memoryview(view_bytes)) != bytes(arr_simple):
+        print(f'View {n} {k}:')
+        print(list(view), view_bytes.arr)
+    if n:
+        view = RotatedView(list(arr), k)
+        view[0] = -1
+        view[n // 2:] = [-2] * (n - n // 2)
+        expected = [-1] + arr_simple[1:n // 2] + [-2] * (n - n // 2) if n > 1 else [-2]
+        if view.materialize() != expected:
+            print(f'View write {n} {k}:')
+            print(view.arr, expected)
     if arr_cycle != arr_simple:
         print(f'Cycle {n} {k}:')
         print(arr_cycle)
@@ -103,3 +371,35 @@ def check(n: int, k: int) -> None:
 
 for n, k in nk:
     check(n, k)
+
+def _run_benchmark() -> None:
+    from time import perf_counter
+    def make(kind: str, n: int) -> Any:
+        if kind == 'list':
+            return list(range(n))
+        if kind == 'bytearray':
+            return bytearray(n)
+        return array('d', range(n))
+    engines = {
+        'cycle': shift_cycle,
+        'reverse': shift_reverse,
+        'block': shift_block,
+    }
+    print(f'{"kind":>10}{"n":>9}{"k":>9}' + ''.join(f'{name:>10}' for name in engines))
+    for kind in ('list', 'bytearray', 'array d'):
+        for n in (8, 16, 64, 10000, 1000000):
+            for k in (1, n // 3):
+                line = f'{kind:>10}{n:>9}{k:>9}'
+                reps = max(1, 100000 // n)
+                for shift in engines.values():
+                    arr = make(kind, n)
+                    start = perf_counter()
+                    for _ in range(reps):
+                        shift(arr, k)
+                    line += f'{(perf_counter() - start) / reps * 1e6:>8.1f}us'
+                print(line)
+
+if __name__ == '__main__':
+    import sys
+    if sys.argv[1:] == ['bench']:
+        _run_benchmark()